@@ -200,11 +200,8 @@ def add_to_database(lines: list[str], table: str) -> None:
     d.createTable(table, cols, types)
 
     # add the data
-    for line in lines[1:]:
-        values = [x.strip() for x in line.split(",")]
-        d.insert(table, cols, values)
-
-    d.commitChanges()
+    rows = ([x.strip() for x in line.split(",")] for line in lines[1:])
+    d.insertMany(table, cols, rows)
 
 
 def clean(path: str) -> str:
@@ -1,71 +1,133 @@
 """This module contains the code to create the builds and save them \
     to the SQLite database."""
+
+import os
+from typing import Iterable, Iterator
+
+import numpy as np
+from ujson import dumps
+
+from modules.builds_matrix import BuildsMatrix
+from modules.constants import (
+    BUILDS_COMPOSITE_INDEXES,
+    ID_ATTRIBUTES,
+    PARTS_ATTRIBUTES,
+    RESULT_CACHE_TABLE,
+    SKYLINE_CACHE_TABLE,
+    SNAPSHOT_PATH,
+    EntityId,
+)
 from modules.database import Database, MK8Deluxe
-from modules.entities import Entity
 
 
-def build() -> list[Entity]:
-    """Create and return the builds.
+def build() -> Iterator[BuildsMatrix]:
+    """Create the builds, one driver at a time.
+
+    Each part table is loaded once and the builds of each driver \
+        are the broadcast sum of the driver with all the other parts.
 
-    Returns:
-        list[Entity]: list of builds
+    Yields:
+        BuildsMatrix: builds of a single driver.
     """
     m = MK8Deluxe()
-    builds = []
-
-    for d in m.driver:
-        for v in m.vehicle:
-            for t in m.tyre:
-                for g in m.glider:
-                    builds.append(d + v + t + g)
+    drivers, *parts = [
+        m.partMatrix(e)
+        for e in [EntityId.DRIVER, EntityId.VEHICLE, EntityId.TYRE, EntityId.GLIDER]
+    ]
 
-    return builds
+    first_id = 0
+    for x in range(drivers[0].shape[0]):
+        driver = (drivers[0][x : x + 1], drivers[1][x : x + 1])
+        builds = BuildsMatrix.fromParts([driver, *parts], first_id)
+        first_id += len(builds)
+        yield builds
 
 
-def write_to_file(builds: list[Entity], path: str):
+def write_to_file(builds: Iterable[BuildsMatrix], path: str):
     """Write the builds to a csv file.
 
     Args:
-        builds (list[Entity]): The builds to write.
+        builds (Iterable[BuildsMatrix]): The builds to write.
         path (str): The path to the file.
     """
     with open(path, "w") as f:
-        f.write(builds[0].csv_cols + "\n")
-        f.writelines(b.csv + "\n" for b in builds)
-
-
-def write_to_sql(builds: list[Entity], path: str):
+        f.write(",".join(PARTS_ATTRIBUTES + ID_ATTRIBUTES) + "\n")
+        for b in builds:
+            rows = np.hstack([b.stats, b.parts]).tolist()
+            f.writelines(",".join(str(v) for v in r) + "\n" for r in rows)
+
+
+def write_to_sql(
+    builds: Iterable[BuildsMatrix],
+    path: str,
+    indexes: bool = True,
+    analyze: bool = True,
+):
     """Write the builds to a SQL file.
 
     Args:
-        builds (list[Entity]): The builds to write.
+        builds (Iterable[BuildsMatrix]): The builds to write.
         path (str): The path to the file.
+        indexes (bool, optional): index each part attribute and the \
+            attributes filtered together most often. Defaults to True.
+        analyze (bool, optional): collect the statistics of the indexes, \
+            so that the query planner only uses the selective ones. \
+            Defaults to True.
     """
     d = Database(path)
 
-    # empty the old table and create a new one
-    d.deleteTable("builds")
+    with d.bulkLoad(unsafe=True):
+        # empty the old table and create a new one
+        d.deleteTable("builds")
+        # the cached skylines and results refer to the old builds
+        for table in [SKYLINE_CACHE_TABLE, RESULT_CACHE_TABLE]:
+            if d.tableExists(table):
+                d.deleteTable(table)
+
+        cols = ["id"] + PARTS_ATTRIBUTES + ID_ATTRIBUTES
 
-    cols = ["id"]
-    cols.extend(builds[0].cols)
+        types = ["INTEGER" for _ in range(len(cols))]
+        d.createTable("builds", cols, types, cols[0])
 
-    types = ["INTEGER" for _ in range(len(cols))]
-    d.createTable("builds", cols, types, cols[0])
+        # insert the new builds
+        for b in builds:
+            rows = np.column_stack([b.ids, b.stats, b.parts]).tolist()
+            d.insertMany("builds", cols, rows)
 
-    # insert the new builds
-    for x, b in enumerate(builds):
-        row = [x]
-        row.extend(b.rows)
-        d.insert("builds", cols, row)
+        # indexes are created after the rows, which is faster than updating them
+        if indexes:
+            for a in PARTS_ATTRIBUTES:
+                d.createIndex("builds", [a])
+            for c in BUILDS_COMPOSITE_INDEXES:
+                d.createIndex("builds", c)
+
+    if analyze:
+        d.analyze("builds")
+
+
+def write_to_snapshot(
+    builds: Iterable[BuildsMatrix],
+    names: dict[EntityId, dict[int, list[str]]],
+    path: str,
+):
+    """Write the builds and the names of the parts to a binary snapshot.
+
+    Args:
+        builds (Iterable[BuildsMatrix]): The builds to write.
+        names (dict[EntityId, dict[int, list[str]]]): The names of the parts.
+        path (str): The path to the snapshot directory.
+    """
+    BuildsMatrix.concatenate(list(builds)).save(path)
 
-    d.commitChanges()
+    with open(os.path.join(path, "names.json"), "w") as f:
+        f.write(dumps({e.value: n for e, n in names.items()}))
 
 
 def main():
     """Run the main function for the create builds script."""
-    builds = build()
-    write_to_file(builds, "builds.csv")
-    write_to_sql(builds, "MK8D")
+    write_to_file(build(), "builds.csv")
+    write_to_sql(build(), "MK8D")
+    write_to_snapshot(build(), MK8Deluxe().partNames(), SNAPSHOT_PATH)
 
 
 if __name__ == "__main__":
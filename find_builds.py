@@ -5,9 +5,17 @@ The class offers the ability to sort, filter and score each of them.
 """
 
 import argparse
+import sys
+from typing import TextIO
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from ujson import dumps
 
 from modules.algorithms import AlgorithmName
+from modules.build_query import BuildQuery
 from modules.builds_printer import BuildsPrinter
+from modules.clustering import KMeansMode
 from modules.command_parsers import (
     AttributesParser,
     FilterParser,
@@ -15,80 +23,159 @@ from modules.command_parsers import (
     WeightParser,
 )
 from modules.database import MK8DeluxeBuilds
+from modules.skyline import SkylineMode
 
 
-def find(parameters: argparse.Namespace) -> None:
-    """Run the main function for the create named builds script."""
-    m = MK8DeluxeBuilds()
+def build_query(parameters: argparse.Namespace) -> BuildQuery:
+    """Create the query described by the command line arguments.
+
+    Args:
+        parameters (argparse.Namespace): parsed command line arguments.
+
+    Returns:
+        BuildQuery
+    """
+    # builds can be either be scored (and then accessed via m.scored_named_builds)
+    # or the best builds can be computed via the various implemented algorithms
+    # (skyline, topk, kmeans, medrank, threshold)
+    algorithm = None
+    if parameters.skyline:
+        algorithm = AlgorithmName.SKYLINE
+    elif parameters.topk:
+        algorithm = AlgorithmName.TOPK
+    elif parameters.k_means:
+        algorithm = AlgorithmName.KMEANS
+    elif parameters.medrank:
+        algorithm = AlgorithmName.MEDRANK
+    elif parameters.threshold:
+        algorithm = AlgorithmName.THRESHOLD
+
+    # the limit is the maximum number of results to return,
+    # the seed is used by the random number generator
+    query = BuildQuery(
+        algorithm=algorithm,
+        limit=parameters.limit,
+        seed=parameters.seed,
+        skyline_mode=parameters.skyline_mode,
+        kmeans_mode=parameters.kmeans_mode,
+    )
 
+    for attributes in [
+        parameters.query_filters,
+        parameters.query_sort,
+        parameters.query_weights,
+        parameters.ranking_attributes,
+    ]:
+        if attributes is not None:
+            for key, value in attributes.items():
+                query = query.withAttribute(key, value)
+
+    return query
+
+
+def run(
+    m: MK8DeluxeBuilds, parameters: argparse.Namespace, file: TextIO = None
+) -> None:
+    """Run a query on the builds database and print its results.
+
+    Args:
+        m (MK8DeluxeBuilds)
+        parameters (argparse.Namespace): parsed command line arguments.
+        file (TextIO, optional): where to print the results. \
+            Defaults to None (standard output).
+    """
     if parameters.list_filters:
-        print(MK8DeluxeBuilds.available_filters)
+        print(MK8DeluxeBuilds.available_filters, file=file)
         return
     if parameters.list_sort_orders:
-        print(MK8DeluxeBuilds.available_sorts_orders)
+        print(MK8DeluxeBuilds.available_sorts_orders, file=file)
         return
     if parameters.list_weights:
-        print(MK8DeluxeBuilds.available_weights)
+        print(MK8DeluxeBuilds.available_weights, file=file)
         return
     if parameters.list_ranking_attributes:
-        print(MK8DeluxeBuilds.available_ranking_attributes)
+        print(MK8DeluxeBuilds.available_ranking_attributes, file=file)
         return
 
-    if parameters.query_filters is not None:
-        for key, value in parameters.query_filters.items():
-            setattr(m, key, value)
-
-    if parameters.query_sort is not None:
-        for key, value in parameters.query_sort.items():
-            setattr(m, key, value)
-
-    if parameters.query_weights is not None:
-        for key, value in parameters.query_weights.items():
-            setattr(m, key, value)
-
-    if parameters.ranking_attributes is not None:
-        for key, value in parameters.ranking_attributes.items():
-            setattr(m, key, value)
-
-    # set the seed for the random number generator
-    if parameters.seed is not None:
-        m.seed = parameters.seed
-
-    # use m.limit to set the maximum number of results to return
-    m.limit = parameters.limit
-
-    # builds can be either be scored (and then accessed via m.scored_named_builds)
-    # or the best builds can be computed via the various implemented algorithms
-    # (skyline, topk, kmeans, medrank)
-    if parameters.skyline:
-        m.algorithm = AlgorithmName.SKYLINE
-    elif parameters.topk:
-        m.algorithm = AlgorithmName.TOPK
-    elif parameters.k_means:
-        m.algorithm = AlgorithmName.KMEANS
-    elif parameters.medrank:
-        m.algorithm = AlgorithmName.MEDRANK
-
-    builds = m.sortBuilds()
+    m.applyQuery(build_query(parameters))
+    builds = m.iterBuilds()
 
     # use the BuildsPrinter class to print the builds
     if parameters.csv:
-        BuildsPrinter.printCSV(builds)
+        BuildsPrinter.printCSV(builds, file)
     elif parameters.json:
-        BuildsPrinter.printJSON(builds)
+        BuildsPrinter.printJSON(builds, file)
     elif parameters.json_pretty:
-        BuildsPrinter.printJSONPretty(builds)
+        BuildsPrinter.printJSONPretty(builds, file)
     elif parameters.markdown:
-        BuildsPrinter.printMarkdown(builds)
+        BuildsPrinter.printMarkdown(builds, file)
     elif parameters.toml:
-        BuildsPrinter.printTOML(builds)
+        BuildsPrinter.printTOML(builds, file)
     else:
         for x, b in enumerate(builds):
-            print(f"{x}: {b}")
+            print(f"{x}: {b}", file=file)
 
 
-def main():
-    """Run the main function for the find builds script."""
+def query_server(url: str, args: list[str]) -> None:
+    """Send the query to a running builds server and print its results.
+
+    Args:
+        url (str): address of the server.
+        args (list[str]): command line arguments of the query.
+    """
+    request = Request(
+        url,
+        data=dumps({"args": args}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urlopen(request) as response:
+            sys.stdout.write(response.read().decode())
+    except HTTPError as e:
+        sys.exit(e.read().decode())
+
+
+def find(parameters: argparse.Namespace) -> None:
+    """Run the main function for the create named builds script."""
+    m = MK8DeluxeBuilds(
+        persistent_cache=parameters.persistent_cache,
+        virtual=parameters.virtual,
+        streaming=parameters.streaming,
+        workers=parameters.workers,
+        snapshot=parameters.snapshot,
+    )
+
+    run(m, parameters)
+
+
+def server_args(argv: list[str]) -> list[str]:
+    """Remove the address of the server from the command line arguments.
+
+    Args:
+        argv (list[str]): command line arguments.
+
+    Returns:
+        list[str]: arguments of the query, sent to the server.
+    """
+    args = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg == "--server":
+            skip = True
+        elif not arg.startswith("--server="):
+            args.append(arg)
+
+    return args
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create the parser of the command line arguments.
+
+    Returns:
+        argparse.ArgumentParser
+    """
     # start the argument parser
     parser = argparse.ArgumentParser(
         "Find builds",
@@ -164,7 +251,7 @@ def main():
     algorithm_parser.add_argument(
         "--skyline",
         action="store_true",
-        help="Find the builds according to the BNL algorithm.",
+        help="Find the builds in the skyline of the ranking attributes.",
     )
 
     algorithm_parser.add_argument(
@@ -179,6 +266,12 @@ def main():
         help="Find the builds according to the MedRank algorithm.",
     )
 
+    algorithm_parser.add_argument(
+        "--threshold",
+        action="store_true",
+        help="Find the builds according to their score, using the Threshold Algorithm.",
+    )
+
     # parser group for query parameters
     parameters_parser = parser.add_argument_group("Query parameters")
     parameters_parser.add_argument(
@@ -216,6 +309,54 @@ def main():
         action=AttributesParser,
     )
 
+    parameters_parser.add_argument(
+        "--skyline-mode",
+        choices=[x.value for x in SkylineMode],
+        default=None,
+        help="Strategy used by the skyline algorithm.",
+    )
+
+    parameters_parser.add_argument(
+        "--kmeans-mode",
+        choices=[x.value for x in KMeansMode],
+        default=None,
+        help="Strategy used by the K-Means algorithm to update the centroids.",
+    )
+
+    parameters_parser.add_argument(
+        "--virtual",
+        action="store_true",
+        help="Compute the builds from the parts instead of reading the builds table.",
+    )
+
+    parameters_parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Read the builds table in batches for the top-k queries, "
+        "keeping only the best builds in memory.",
+    )
+
+    parameters_parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="Map the binary snapshot of the builds "
+        "instead of reading the builds table.",
+    )
+
+    parameters_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes running the top-k and skyline algorithms.",
+    )
+
+    parameters_parser.add_argument(
+        "--persistent-cache",
+        action="store_true",
+        help="Save the computed skylines and the results of the queries "
+        "in the database, to reuse them later.",
+    )
+
     parameters_parser.add_argument(
         "--seed",
         type=int,
@@ -223,7 +364,23 @@ def main():
         help="Seed for the random number generator. Used only for the K-Means algorithm.",
     )
 
-    args = parser.parse_args()
+    parameters_parser.add_argument(
+        "--server",
+        default=None,
+        help="Address of a running builds server (see serve_builds.py) "
+        "answering the query instead of this process.",
+    )
+
+    return parser
+
+
+def main():
+    """Run the main function for the find builds script."""
+    args = build_parser().parse_args()
+
+    if args.server is not None:
+        query_server(args.server, server_args(sys.argv[1:]))
+        return
 
     find(args)
 
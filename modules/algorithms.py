@@ -2,11 +2,15 @@
 
 from __future__ import annotations
 
-import random
 from enum import Enum
-from time import time
 
-from modules.entities import NamedBuild
+import numpy as np
+
+from modules.builds_matrix import BuildsMatrix
+from modules.clustering import KMeans, KMeansMode
+from modules.constants import SCORE_DECIMALS
+from modules.parallel import ParallelRunner
+from modules.skyline import Skyline, SkylineMode
 
 
 class AlgorithmName(Enum):
@@ -16,6 +20,7 @@ class AlgorithmName(Enum):
     SKYLINE = "skyline"
     KMEANS = "kmeans"
     MEDRANK = "medrank"
+    THRESHOLD = "threshold"
 
 
 class Algorithms:
@@ -32,9 +37,17 @@ class Algorithms:
             AlgorithmName.SKYLINE.value: self._skyline,
             AlgorithmName.KMEANS.value: self._kmeans,
             AlgorithmName.MEDRANK.value: self._medrank,
+            AlgorithmName.THRESHOLD.value: self._threshold,
         }
 
         self._current_algorithm = None
+        self._current_name = None
+        self._skyline_engine = Skyline()
+        self._kmeans_engine = KMeans()
+        # attributes computed by the last algorithm for each returned build
+        self._extra_attributes = {}
+        # runner of the algorithms split on multiple processes, if any
+        self._parallel = None
 
     def setAlgorithm(self, algorithm: AlgorithmName) -> None:
         """Set the algorithm to use.
@@ -43,82 +56,226 @@ class Algorithms:
             algorithm (AlgorithmName)
         """
         self._current_algorithm = self._algorithms[algorithm.value]
+        self._current_name = algorithm
+
+    def resetAlgorithm(self) -> None:
+        """Forget the selected algorithm and the strategies of its engines.
+
+        The processes running the algorithms, if any, are kept.
+        """
+        self._current_algorithm = None
+        self._current_name = None
+        self._skyline_engine = Skyline()
+        self._kmeans_engine = KMeans()
+        self.resetExtraAttributes()
 
-    def runAlgorithm(self, builds: list[NamedBuild], **kwargs) -> list[NamedBuild]:
+    def setSkylineMode(self, mode: SkylineMode) -> None:
+        """Set the strategy used by the skyline algorithm.
+
+        Args:
+            mode (SkylineMode)
+        """
+        self._skyline_engine.setMode(mode)
+
+    def runAlgorithm(self, builds: BuildsMatrix, **kwargs) -> np.ndarray:
         """Run the algorithm.
 
         Args:
-            builds (list[NamedBuild])
+            builds (BuildsMatrix)
 
         Returns:
-            list[NamedBuild]
+            np.ndarray: indexes of the selected builds in the matrix.
         """
         if self._current_algorithm is None:
             raise ValueError("No algorithm set")
 
+        self.resetExtraAttributes()
         return self._current_algorithm(builds, **kwargs)
 
-    def _topk(self, builds: list[NamedBuild], **kwargs) -> list[NamedBuild]:
-        for f in kwargs["sort"][::-1]:
-            builds.sort(key=lambda x: x.__getattribute__(f[0]), reverse=f[1])
+    def resetExtraAttributes(self) -> None:
+        """Forget the attributes computed by the last algorithm run.
 
-        if kwargs.get("limit") is not None:
-            builds = builds[: kwargs["limit"]]
+        Used when the builds are selected without running the algorithm.
+        """
+        self._extra_attributes = {}
 
-        return builds
+    def setWorkers(self, workers: int) -> None:
+        """Set the number of processes running the top-k and skyline algorithms.
 
-    def _skyline(self, builds: list[NamedBuild], **kwargs) -> list[NamedBuild]:
-        attributes = [k for k, v in kwargs["rank_attributes"].items() if v]
-        w: set[NamedBuild] = set()
+        Args:
+            workers (int): number of processes, 1 to run in this process only.
 
-        for p in builds:
-            if any(pp.dominate(p, attributes) for pp in w):
-                continue
-            w.add(p)
+        Raises:
+            ValueError: the number of processes is not valid.
+        """
+        if workers < 1:
+            raise ValueError(f"{workers} is not a valid number of workers")
 
-        return list(w)
+        self._parallel = ParallelRunner(workers) if workers > 1 else None
 
-    def _kmeans(self, builds: list[NamedBuild], **kwargs) -> list[NamedBuild]:
-        seed = kwargs.get("seed", time())
-        limit = kwargs.get("limit", 5)
+    def setKMeansMode(self, mode: KMeansMode) -> None:
+        """Set the strategy used by the k-means algorithm.
 
-        random.seed(seed)
+        Args:
+            mode (KMeansMode)
+        """
+        self._kmeans_engine.setMode(mode)
 
-        attributes = [k for k, v in kwargs["rank_attributes"].items() if v]
-        centroids = random.sample(builds, limit)
+    @property
+    def extra_attributes(self) -> dict[int, dict[str, int | float]]:
+        """Return the attributes computed by the last algorithm run.
+
+        Returns:
+            dict[int, dict[str, int | float]]: attributes of the builds, \
+                indexed by row.
+        """
+        return self._extra_attributes
 
-        while True:
-            new_centroids = []
-            for c in centroids:
-                closest = min(builds, key=lambda x: c.distance(x, attributes))
-                new_centroids.append(closest)
+    @property
+    def current_algorithm(self) -> AlgorithmName | None:
+        """Return the algorithm in use.
 
-            if new_centroids == centroids:
-                break
+        Returns:
+            AlgorithmName | None: None if no algorithm is set.
+        """
+        return self._current_name
+
+    @property
+    def available_algorithms(self) -> list[str]:
+        """Return the names of the available algorithms.
 
-            centroids = new_centroids
+        Returns:
+            list[str]
+        """
+        return list(self._algorithms.keys())
 
-        return centroids
+    def _topk(self, builds: BuildsMatrix, **kwargs) -> np.ndarray:
+        if kwargs.get("limit") is not None:
+            if self._parallel is not None and kwargs["limit"] > 0:
+                return self._parallel.topk(builds, kwargs["sort"], kwargs["limit"])
 
-    def _medrank(self, builds: list[NamedBuild], **kwargs) -> list[NamedBuild]:
-        limit = kwargs.get("limit", 5)
+            return builds.topk(kwargs["sort"], kwargs["limit"])
+
+        return builds.argsort(kwargs["sort"])
+
+    def _skyline(self, builds: BuildsMatrix, **kwargs) -> np.ndarray:
         attributes = [k for k, v in kwargs["rank_attributes"].items() if v]
-        lists = [[] for _ in range(len(attributes))]
-        sorted_builds = []
+        if self._parallel is not None:
+            skyline = self._parallel.skyline(builds, attributes, self._skyline_engine)
+        else:
+            skyline = self._skyline_engine.compute(builds.columns(attributes))
+
+        return np.flatnonzero(skyline)
+
+    def _kmeans(self, builds: BuildsMatrix, **kwargs) -> np.ndarray:
+        limit = kwargs.get("limit") or 5
+        attributes = [k for k, v in kwargs["rank_attributes"].items() if v]
+        # no builds to cluster, the engine needs at least one cluster
+        if len(builds) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        points = builds.columns(attributes)
+
+        centroids, labels = self._kmeans_engine.fit(
+            points, min(limit, len(builds)), kwargs.get("seed")
+        )
+        rows = self._kmeans_engine.closest(points, centroids, labels)
+
+        # save the size of the cluster each returned build represents
+        sizes = np.bincount(labels, minlength=centroids.shape[0])
+        self._extra_attributes = {
+            x: {"cluster_size": s}
+            for x, s in zip(rows.tolist(), sizes[sizes > 0].tolist())
+        }
 
-        for x, a in enumerate(attributes):
-            lists[x] = sorted(builds, key=lambda x: x.__getattribute__(a), reverse=True)
+        return rows
 
-        for x, b in enumerate(builds):
-            positions = [len(builds) for _ in range(len(attributes))]
-            for y, a in enumerate(attributes):
-                # get the position of the build in the list
-                positions[y] = lists[y].index(b)
+    def _medrank(self, builds: BuildsMatrix, **kwargs) -> np.ndarray:
+        limit = kwargs.get("limit") or 5
+        attributes = [k for k, v in kwargs["rank_attributes"].items() if v]
+        if not attributes:
+            raise ValueError(
+                "At least one attribute must be provided for the medrank query"
+            )
+
+        n = len(builds)
+        limit = min(limit, n)
+        lists = [builds.sortedAccess(a) for a in attributes]
+
+        # position of each build in each sorted list
+        positions = np.empty((n, len(attributes)), dtype=np.int64)
+        for y, order in enumerate(lists):
+            positions[order, y] = np.arange(n)
+
+        # a build is output once it has been seen in the majority of the lists
+        majority = len(attributes) // 2 + 1
+        seen = np.zeros(n, dtype=np.int64)
+        depth = 0
+        block = limit
+
+        # read the lists in lockstep until enough builds are seen in the majority
+        while depth < n:
+            for order in lists:
+                seen += np.bincount(order[depth : depth + block], minlength=n)
+            depth = min(depth + block, n)
+            block *= 2
+
+            if np.count_nonzero(seen >= majority) >= limit:
+                break
+
+        # builds are output in the order they reached the majority
+        found = np.flatnonzero(seen >= majority)
+        reached = np.partition(positions[found], majority - 1, axis=1)[:, majority - 1]
+        order = np.argsort(reached, kind="stable")
 
-            # get the median position
-            median = sorted(positions)[len(positions) // 2]
-            sorted_builds.append((median, b))
+        return found[order[:limit]]
 
-        sorted_builds.sort(key=lambda x: x[0], reverse=True)
+    def _threshold(self, builds: BuildsMatrix, **kwargs) -> np.ndarray:
+        limit = kwargs.get("limit", 5)
+        weights = {k: v for k, v in kwargs["weight"].items() if v != 0}
+
+        # no build is wanted, and the blocks read from the lists would be empty
+        if limit is not None and limit <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        if limit is None or limit >= len(builds) or not weights:
+            limit = len(builds) if limit is None else limit
+            scores = builds.columns(list(weights)) @ np.array(list(weights.values()))
+            scores = np.round(scores, SCORE_DECIMALS)
+            return np.argsort(-scores, kind="stable")[:limit]
+
+        attributes = list(weights)
+        w = np.array(list(weights.values()))
+        stats = builds.columns(attributes)
+        lists = [builds.sortedAccess(a) for a in attributes]
+
+        seen = np.zeros(len(builds), dtype=bool)
+        scores = np.full(len(builds), -np.inf)
+        depth = 0
+        block = limit
+
+        while depth < len(builds):
+            # sorted access: read the next block of each list
+            new = np.concatenate([lst[depth : depth + block] for lst in lists])
+            new = np.unique(new[~seen[new]])
+            depth = min(depth + block, len(builds))
+            block *= 2
+
+            # random access: compute the score of the builds seen for the first time
+            seen[new] = True
+            scores[new] = np.round(stats[new] @ w, SCORE_DECIMALS)
+
+            # best possible score of any build not seen yet
+            last = np.array([lst[depth - 1] for lst in lists])
+            threshold = np.round(
+                w @ stats[last, np.arange(len(attributes))], SCORE_DECIMALS
+            )
+
+            # the top-k is final when the k-th best score beats the threshold
+            kth = np.partition(-scores, limit - 1)[limit - 1]
+            if -kth > threshold:
+                break
 
-        return [b for _, b in sorted_builds[:limit]]
+        seen_rows = np.flatnonzero(seen)
+        order = np.argsort(-scores[seen_rows], kind="stable")
+        return seen_rows[order[:limit]]
@@ -0,0 +1,147 @@
+"""This module contains the asynchronous interface to the builds database."""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from ujson import dumps, loads
+
+from .build_query import BuildQuery
+from .database import MK8DeluxeBuilds
+from .entities import NamedBuild
+
+# objects answering the queries in a process of a process pool, \
+#   indexed by the JSON of their options and created on first use
+_process_builds: dict[str, MK8DeluxeBuilds] = {}
+
+
+def _runInProcess(options: str, query: str) -> list[NamedBuild]:
+    """Answer a query in a process of a process pool.
+
+    The connections can't be sent to other processes, so only the JSON \
+        of the options and of the query is sent, and each process keeps \
+        its own object for the next queries.
+
+    Args:
+        options (str): JSON of the options of the MK8DeluxeBuilds object.
+        query (str): JSON of the query.
+
+    Returns:
+        list[NamedBuild]: list of sorted builds.
+    """
+    if options not in _process_builds:
+        _process_builds[options] = MK8DeluxeBuilds(read_only=True, **loads(options))
+
+    builds = _process_builds[options]
+    builds.applyQuery(BuildQuery.fromJSON(query))
+    return builds.sortBuilds()
+
+
+class AsyncBuilds:
+    """Answer concurrent queries on the builds from asyncio code.
+
+    A MK8DeluxeBuilds object holds the parameters of a single query, so a pool \
+        of them is kept, each with its own read only connection. Each query \
+        borrows an object of the pool and runs on the executor, leaving the \
+        event loop free, so up to size queries run at the same time. \
+        Each object keeps its own loaded builds and caches, which are \
+        reused by the next queries it answers. On a process pool, each \
+        process keeps its own object instead.
+    """
+
+    def __init__(
+        self, size: int = 4, executor: Executor = None, **kwargs
+    ) -> AsyncBuilds:
+        """Create the pool. The objects are created on first use.
+
+        Args:
+            size (int, optional): number of queries run at the same time. \
+                Defaults to 4.
+            executor (Executor, optional): thread or process pool running \
+                the queries. Defaults to None (a pool of size threads).
+            **kwargs: options of each MK8DeluxeBuilds object, \
+                such as snapshot or virtual.
+
+        Raises:
+            ValueError: size is less than 1.
+            TypeError: executor is not a thread or process pool.
+        """
+        if size < 1:
+            raise ValueError(f"{size} is not a valid pool size")
+        if executor is not None and not isinstance(
+            executor, ThreadPoolExecutor | ProcessPoolExecutor
+        ):
+            raise TypeError(f"{executor} is not a thread or process pool")
+
+        self._size = size
+        self._kwargs = kwargs
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=size)
+        # options sent to the processes, None if the queries run on threads
+        self._options = None
+        if isinstance(executor, ProcessPoolExecutor):
+            self._options = dumps(kwargs, sort_keys=True)
+        # objects not answering a query, None until first used
+        self._pool = None
+        self._builds = []
+
+    async def run(self, query: BuildQuery) -> list[NamedBuild]:
+        """Answer a query, waiting for a free object of the pool if needed.
+
+        Args:
+            query (BuildQuery)
+
+        Returns:
+            list[NamedBuild]: list of sorted builds.
+        """
+        loop = asyncio.get_running_loop()
+        if self._options is not None:
+            return await loop.run_in_executor(
+                self._executor, _runInProcess, self._options, query.json
+            )
+
+        if self._pool is None:
+            self._pool = asyncio.Queue()
+            for _ in range(self._size):
+                self._pool.put_nowait(None)
+
+        builds = await self._pool.get()
+        try:
+            if builds is None:
+                builds = MK8DeluxeBuilds(read_only=True, **self._kwargs)
+                self._builds.append(builds)
+
+            return await loop.run_in_executor(self._executor, self._run, builds, query)
+        finally:
+            self._pool.put_nowait(builds)
+
+    @staticmethod
+    def _run(builds: MK8DeluxeBuilds, query: BuildQuery) -> list[NamedBuild]:
+        """Answer a query on the executor.
+
+        Args:
+            builds (MK8DeluxeBuilds): object of the pool.
+            query (BuildQuery)
+
+        Returns:
+            list[NamedBuild]: list of sorted builds.
+        """
+        builds.applyQuery(query)
+        return builds.sortBuilds()
+
+    def close(self) -> None:
+        """Close the connections of the pool and its executor, if owned."""
+        if self._own_executor:
+            self._executor.shutdown()
+        for builds in self._builds:
+            builds.close()
+        self._builds = []
+
+    async def __aenter__(self) -> AsyncBuilds:
+        """Enter the context, returning the pool itself."""
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        """Exit the context, closing the pool."""
+        self.close()
@@ -0,0 +1,328 @@
+"""This module contains the immutable description of a query on the builds \
+and the plan it is compiled to."""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field, replace
+from functools import cached_property
+
+from ujson import dumps, loads
+
+from .algorithms import AlgorithmName
+from .clustering import KMeansMode
+from .constants import DATA_ATTRIBUTES, PARTS_ATTRIBUTES
+from .skyline import SkylineMode
+
+# prefixes of the attribute names setting a part of the query,
+# such as min_acceleration or weight_ground_speed
+QUERY_PREFIXES = ["min", "max", "sort", "weight", "rank"]
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    """Parameters of a query, validated and arranged as the engine uses them.
+
+    Attributes:
+        sql_filter (list[tuple[str, str, float]]): filters on the part \
+            attributes, applied when the builds are loaded.
+        data_filter (list[tuple[str, str, float]]): filters on the data \
+            attributes, such as score, applied once they are computed.
+        sort (list[tuple[str, bool]]): (attribute, descending) sort keys.
+        weights (dict[str, float]): weight of each part attribute.
+        rank_attributes (dict[str, bool]): whether each part attribute \
+            is a ranking attribute.
+        algorithm (AlgorithmName)
+        limit (int)
+        seed (int)
+        skyline_mode (SkylineMode)
+        kmeans_mode (KMeansMode)
+    """
+
+    sql_filter: list[tuple[str, str, float]] = field(default_factory=list)
+    data_filter: list[tuple[str, str, float]] = field(default_factory=list)
+    sort: list[tuple[str, bool]] = field(default_factory=list)
+    weights: dict[str, float] = field(default_factory=dict)
+    rank_attributes: dict[str, bool] = field(default_factory=dict)
+    algorithm: AlgorithmName = None
+    limit: int = None
+    seed: int = None
+    skyline_mode: SkylineMode = None
+    kmeans_mode: KMeansMode = None
+
+
+@dataclass(frozen=True)
+class BuildQuery:
+    """Parameters of a query on the builds.
+
+    A query can't be changed once created, so it can be shared by concurrent \
+        tasks, hashed, used as a cache key and sent to other processes. \
+        The with* methods return a new query with a parameter changed.
+
+    Attributes:
+        filters (tuple[tuple[str, str, float], ...]): (attribute, \
+            "min" or "max", value) filters.
+        sort (tuple[tuple[str, int], ...]): (attribute, direction) sort keys, \
+            1 ascending and -1 descending.
+        weights (tuple[tuple[str, float], ...]): (attribute, weight) weights \
+            of the score.
+        rank_attributes (tuple[str, ...]): attributes of the ranking algorithms.
+        algorithm (AlgorithmName): Defaults to None (no algorithm).
+        limit (int): maximum number of builds. Defaults to None (no limit).
+        seed (int): seed of the random number generator. Defaults to None.
+        skyline_mode (SkylineMode): Defaults to None (the default strategy).
+        kmeans_mode (KMeansMode): Defaults to None (the default strategy).
+    """
+
+    filters: tuple[tuple[str, str, float], ...] = ()
+    sort: tuple[tuple[str, int], ...] = ()
+    weights: tuple[tuple[str, float], ...] = ()
+    rank_attributes: tuple[str, ...] = ()
+    algorithm: AlgorithmName = None
+    limit: int = None
+    seed: int = None
+    skyline_mode: SkylineMode = None
+    kmeans_mode: KMeansMode = None
+
+    def __post_init__(self) -> None:
+        """Convert the parameters read from JSON to their hashable types."""
+        # the dataclass is frozen, so the fields are set bypassing it
+        for name in ["filters", "sort", "weights"]:
+            values = getattr(self, name)
+            if not isinstance(values, tuple) or not all(
+                isinstance(x, tuple) for x in values
+            ):
+                object.__setattr__(self, name, tuple(tuple(x) for x in values))
+        if not isinstance(self.rank_attributes, tuple):
+            object.__setattr__(self, "rank_attributes", tuple(self.rank_attributes))
+
+        for name, enum in [
+            ("algorithm", AlgorithmName),
+            ("skyline_mode", SkylineMode),
+            ("kmeans_mode", KMeansMode),
+        ]:
+            value = getattr(self, name)
+            if value is not None and not isinstance(value, enum):
+                object.__setattr__(self, name, enum(value))
+
+    def withFilter(self, attribute: str, bound: str, value: float) -> BuildQuery:
+        """Add a filter.
+
+        Args:
+            attribute (str)
+            bound (str): "min" or "max".
+            value (float)
+
+        Returns:
+            BuildQuery: the new query.
+        """
+        return replace(self, filters=self.filters + ((attribute, bound, value),))
+
+    def withSort(self, attribute: str, direction: int) -> BuildQuery:
+        """Add a sort key, after the ones already added.
+
+        Args:
+            attribute (str)
+            direction (int): 1 ascending, -1 descending.
+
+        Returns:
+            BuildQuery: the new query.
+        """
+        return replace(self, sort=self.sort + ((attribute, direction),))
+
+    def withWeight(self, attribute: str, weight: float) -> BuildQuery:
+        """Set the weight of an attribute, replacing the previous one.
+
+        Args:
+            attribute (str)
+            weight (float)
+
+        Returns:
+            BuildQuery: the new query.
+        """
+        weights = tuple(w for w in self.weights if w[0] != attribute)
+        return replace(self, weights=weights + ((attribute, weight),))
+
+    def withRankAttribute(self, attribute: str, value: int) -> BuildQuery:
+        """Add (value 1) or remove (value 0) a ranking attribute.
+
+        Args:
+            attribute (str)
+            value (int)
+
+        Raises:
+            ValueError: value is not 0 or 1.
+
+        Returns:
+            BuildQuery: the new query.
+        """
+        if value not in [0, 1]:
+            raise ValueError(f"{value} is not a valid attributes")
+
+        attributes = tuple(a for a in self.rank_attributes if a != attribute)
+        if value:
+            attributes += (attribute,)
+
+        return replace(self, rank_attributes=attributes)
+
+    def withAttribute(self, name: str, value: float) -> BuildQuery:
+        """Set a parameter named as in MK8DeluxeBuilds.available_filters, \
+            available_sorts_orders, available_weights \
+            or available_ranking_attributes.
+
+        Args:
+            name (str): name of the parameter, such as min_acceleration.
+            value (float): value of the parameter.
+
+        Raises:
+            AttributeError: name is not a valid parameter.
+
+        Returns:
+            BuildQuery: the new query.
+        """
+        prefix, _, attribute = name.partition("_")
+        match prefix:
+            case "min" | "max":
+                return self.withFilter(attribute, prefix, value)
+            case "sort":
+                return self.withSort(attribute, value)
+            case "weight":
+                return self.withWeight(attribute, value)
+            case "rank":
+                return self.withRankAttribute(attribute, value)
+
+        raise AttributeError(f"{name} is not a valid query parameter")
+
+    def normalized(self) -> BuildQuery:
+        """Return the same query written in a single way, to be used as a key.
+
+        Filters, weights and ranking attributes are sorted and deduplicated, \
+            since their order does not change the result, and the weights \
+            equal to 0 are removed. The order of the sort keys is kept.
+
+        Returns:
+            BuildQuery: the normalized query.
+        """
+        return replace(
+            self,
+            filters=tuple(sorted({(a, b, float(v)) for a, b, v in self.filters})),
+            sort=tuple((a, int(d)) for a, d in self.sort),
+            weights=tuple(sorted((a, float(w)) for a, w in self.weights if w != 0)),
+            rank_attributes=tuple(sorted(set(self.rank_attributes))),
+        )
+
+    @cached_property
+    def plan(self) -> QueryPlan:
+        """Compile the query, once.
+
+        Raises:
+            AttributeError: a filter, sort, weight or ranking attribute \
+                is not valid.
+            TypeError: a weight, the limit or the seed is not valid.
+            ValueError: a weight or the limit is less than 0.
+
+        Returns:
+            QueryPlan
+        """
+        sql_filter = []
+        data_filter = []
+        for attribute, bound, value in self.filters:
+            if bound not in ["min", "max"]:
+                raise AttributeError(f"{bound}_{attribute} is not a valid filter")
+
+            # filters on the part attributes are passed to the SQL query,
+            # the ones on the data attributes are applied after it
+            if attribute in PARTS_ATTRIBUTES:
+                sql_filter.append((attribute, bound, value))
+            elif attribute in DATA_ATTRIBUTES:
+                data_filter.append((attribute, bound, value))
+            else:
+                raise AttributeError(f"{attribute} is not a valid filter")
+
+        sort = []
+        sortable = PARTS_ATTRIBUTES + DATA_ATTRIBUTES
+        for attribute, direction in self.sort:
+            if attribute not in sortable or direction not in [-1, 1]:
+                raise AttributeError(f"{attribute} is not a valid sort")
+            sort.append((attribute, direction == -1))
+
+        weights = dict.fromkeys(PARTS_ATTRIBUTES, 0)
+        for attribute, weight in self.weights:
+            if attribute not in PARTS_ATTRIBUTES:
+                raise AttributeError(f"{attribute} is not a valid weight")
+            if isinstance(weight, bool) or not isinstance(weight, int | float):
+                raise TypeError(f"{weight} is not a valid weight")
+            if weight < 0:
+                raise ValueError(f"{weight} is not a valid weight")
+            weights[attribute] = float(weight)
+
+        rank_attributes = dict.fromkeys(PARTS_ATTRIBUTES, False)
+        for attribute in self.rank_attributes:
+            if attribute not in PARTS_ATTRIBUTES:
+                raise AttributeError(f"{attribute} is not a valid attributes")
+            rank_attributes[attribute] = True
+
+        if self.limit is not None and not isinstance(self.limit, int):
+            raise TypeError(f"{self.limit} is not a valid limit")
+        if self.limit is not None and self.limit < 0:
+            raise ValueError(f"{self.limit} is not a valid limit")
+        if self.seed is not None and not isinstance(self.seed, int):
+            raise TypeError(f"{self.seed} is not a valid seed")
+
+        return QueryPlan(
+            sql_filter=sql_filter,
+            data_filter=data_filter,
+            sort=sort,
+            weights=weights,
+            rank_attributes=rank_attributes,
+            algorithm=self.algorithm,
+            limit=self.limit,
+            seed=self.seed,
+            skyline_mode=self.skyline_mode,
+            kmeans_mode=self.kmeans_mode,
+        )
+
+    def toDict(self) -> dict:
+        """Convert the query to a dictionary of JSON types.
+
+        Returns:
+            dict
+        """
+        query = asdict(self)
+        for name in ["algorithm", "skyline_mode", "kmeans_mode"]:
+            if query[name] is not None:
+                query[name] = query[name].value
+
+        return query
+
+    @classmethod
+    def fromDict(cls, query: dict) -> BuildQuery:
+        """Create a query from a dictionary created by toDict.
+
+        Args:
+            query (dict)
+
+        Returns:
+            BuildQuery
+        """
+        return cls(**query)
+
+    @property
+    def json(self) -> str:
+        """Convert the query to JSON, the same for equal queries.
+
+        Returns:
+            str
+        """
+        return dumps(self.toDict(), sort_keys=True)
+
+    @classmethod
+    def fromJSON(cls, query: str) -> BuildQuery:
+        """Create a query from its JSON.
+
+        Args:
+            query (str)
+
+        Returns:
+            BuildQuery
+        """
+        return cls.fromDict(loads(query))
@@ -0,0 +1,456 @@
+"""This module contains the columnar representation of the builds."""
+
+from __future__ import annotations
+
+import os
+from typing import Iterable
+
+import numpy as np
+
+from .constants import ID_ATTRIBUTES, PARTS_ATTRIBUTES
+
+
+class BuildsMatrix:
+    """Columnar store of the builds.
+
+    The stats of the builds are kept in a 2-D integer array (one row per build, \
+        one column per part attribute), the ids of the builds and of their parts \
+        in parallel arrays.
+    """
+
+    def __init__(
+        self, ids: np.ndarray, stats: np.ndarray, parts: np.ndarray
+    ) -> BuildsMatrix:
+        """Create a builds matrix.
+
+        Args:
+            ids (np.ndarray): ids of the builds, shape (n,).
+            stats (np.ndarray): stats of the builds, shape (n, len(PARTS_ATTRIBUTES)).
+            parts (np.ndarray): ids of the parts, shape (n, len(ID_ATTRIBUTES)).
+        """
+        self._ids = ids
+        self._stats = stats
+        self._parts = parts
+        # columns computed from the stats, such as score and score_dev
+        self._data = {}
+        # rows sorted by each part attribute, built on first access
+        self._sorted_access = {}
+        # matrix this one was taken from, with the indexes of the rows taken
+        self._parent = None
+        self._parent_rows = None
+
+    def __len__(self) -> int:
+        """Return the number of builds in the matrix.
+
+        Returns:
+            int
+        """
+        return self._ids.shape[0]
+
+    @classmethod
+    def fromRows(cls, rows: list[tuple], cols: list[str]) -> BuildsMatrix:
+        """Create a builds matrix from the rows of a query.
+
+        Args:
+            rows (list[tuple]): rows returned by the query.
+            cols (list[str]): names of the columns of the rows.
+
+        Returns:
+            BuildsMatrix
+        """
+        table = np.array(rows, dtype=np.int64).reshape(len(rows), len(cols))
+
+        ids = table[:, cols.index("id")]
+        stats = table[:, [cols.index(a) for a in PARTS_ATTRIBUTES]]
+        parts = table[:, [cols.index(i) for i in ID_ATTRIBUTES]]
+
+        return cls(ids, stats, parts)
+
+    @classmethod
+    def fromBatches(
+        cls, batches: Iterable[list[tuple]], cols: list[str]
+    ) -> BuildsMatrix:
+        """Create a builds matrix from the rows of a query, read in batches.
+
+        Each batch is converted to an array as soon as it is read, \
+            so the rows of the query are never all held at once.
+
+        Args:
+            batches (Iterable[list[tuple]]): batches of rows returned by the query.
+            cols (list[str]): names of the columns of the rows.
+
+        Returns:
+            BuildsMatrix
+        """
+        tables = [np.array(rows, dtype=np.int64) for rows in batches]
+        if not tables:
+            return cls.fromRows([], cols)
+
+        return cls.fromRows(np.concatenate(tables), cols)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> BuildsMatrix:
+        """Load a builds matrix saved with save.
+
+        Args:
+            path (str): directory of the matrix.
+            mmap (bool, optional): map the files in memory instead of reading \
+                them, so that nothing is copied until it is used, and \
+                processes loading the same matrix share its pages. \
+                The arrays are read-only. Defaults to True.
+
+        Returns:
+            BuildsMatrix
+        """
+        mode = "r" if mmap else None
+        ids, stats, parts = [
+            np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+            for name in ["ids", "stats", "parts"]
+        ]
+        return cls(ids, stats, parts)
+
+    @classmethod
+    def concatenate(cls, matrices: list[BuildsMatrix]) -> BuildsMatrix:
+        """Create a builds matrix with the rows of some matrices, in order.
+
+        Only the computed columns shared by all the matrices are kept.
+
+        Args:
+            matrices (list[BuildsMatrix])
+
+        Returns:
+            BuildsMatrix
+        """
+        matrix = cls(
+            np.concatenate([m.ids for m in matrices]),
+            np.concatenate([m.stats for m in matrices]),
+            np.concatenate([m.parts for m in matrices]),
+        )
+        for name in set.intersection(*(set(m._data) for m in matrices)):
+            matrix.setColumn(name, np.concatenate([m.column(name) for m in matrices]))
+
+        return matrix
+
+    @classmethod
+    def fromParts(
+        cls, parts: list[tuple[np.ndarray, np.ndarray]], first_id: int = 0
+    ) -> BuildsMatrix:
+        """Create the builds combining every part with every other one.
+
+        The stats of the builds are the broadcast sum of the stats of the parts.
+        Builds are ordered as in nested loops over the parts, the first part \
+            being the outermost loop.
+
+        Args:
+            parts (list[tuple[np.ndarray, np.ndarray]]): ids, of shape (p,), \
+                and stats, of shape (p, len(PARTS_ATTRIBUTES)), of each kind \
+                of part, in the order of ID_ATTRIBUTES.
+            first_id (int, optional): id of the first build. Defaults to 0.
+
+        Returns:
+            BuildsMatrix
+        """
+        shape = tuple(ids.shape[0] for ids, _ in parts)
+        stats = np.zeros(shape + (len(PARTS_ATTRIBUTES),), dtype=np.int64)
+
+        for axis, (_, part_stats) in enumerate(parts):
+            # align the stats of the part along its own axis
+            index = [np.newaxis] * len(parts) + [slice(None)]
+            index[axis] = slice(None)
+            stats += part_stats[tuple(index)]
+
+        grid = np.meshgrid(*[ids for ids, _ in parts], indexing="ij")
+        part_ids = np.stack([g.reshape(-1) for g in grid], axis=1)
+        ids = first_id + np.arange(part_ids.shape[0], dtype=np.int64)
+
+        return cls(ids, stats.reshape(-1, len(PARTS_ATTRIBUTES)), part_ids)
+
+    @staticmethod
+    def pruneParts(
+        parts: list[tuple[np.ndarray, np.ndarray]],
+        filters: list[tuple[str, str, int]],
+    ) -> list[np.ndarray]:
+        """Find the parts that can be in a build matching all the filters.
+
+        A part is discarded if, even combined with the best (for min filters) \
+            or worst (for max filters) value of each other kind of part, \
+            a filter cannot be matched. Discarding a part can tighten the bounds \
+            of the other kinds, so the pruning is repeated until nothing changes.
+        Builds combining the remaining parts still have to be filtered.
+
+        Args:
+            parts (list[tuple[np.ndarray, np.ndarray]]): ids and stats \
+                of each kind of part.
+            filters (list[tuple[str, str, int]]): list of \
+                (part attribute, "min" or "max", value) filters.
+
+        Returns:
+            list[np.ndarray]: indexes of the remaining parts of each kind.
+        """
+        keep = [np.arange(ids.shape[0]) for ids, _ in parts]
+
+        changed = True
+        while changed and all(k.shape[0] > 0 for k in keep):
+            changed = False
+            for attribute, bound, value in filters:
+                a = PARTS_ATTRIBUTES.index(attribute)
+                columns = [stats[k, a] for (_, stats), k in zip(parts, keep)]
+
+                # best value each kind of part can contribute to the filter
+                if bound == "min":
+                    best = [c.max() for c in columns]
+                else:
+                    best = [c.min() for c in columns]
+
+                for x, c in enumerate(columns):
+                    others = sum(best) - best[x]
+                    if bound == "min":
+                        feasible = c + others >= value
+                    else:
+                        feasible = c + others <= value
+
+                    if not feasible.all():
+                        keep[x] = keep[x][feasible]
+                        changed = True
+                        break
+
+                if changed:
+                    break
+
+        return keep
+
+    def save(self, path: str) -> None:
+        """Save the ids, stats and parts of the matrix as .npy files.
+
+        Each array is stored with the smallest integer type that can hold it.
+
+        Args:
+            path (str): directory of the matrix, created if needed.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name, array in [
+            ("ids", self._ids),
+            ("stats", self._stats),
+            ("parts", self._parts),
+        ]:
+            np.save(os.path.join(path, f"{name}.npy"), self._compact(array))
+
+    @staticmethod
+    def _compact(array: np.ndarray) -> np.ndarray:
+        """Convert an integer array to the smallest type that can hold it.
+
+        Args:
+            array (np.ndarray)
+
+        Returns:
+            np.ndarray
+        """
+        if array.size == 0:
+            return array.astype(np.int8)
+
+        for dtype in [np.int8, np.int16, np.int32]:
+            info = np.iinfo(dtype)
+            if info.min <= array.min() and array.max() <= info.max:
+                return array.astype(dtype)
+
+        return array.astype(np.int64)
+
+    def take(self, rows: np.ndarray) -> BuildsMatrix:
+        """Return a new matrix containing only the selected rows.
+
+        Args:
+            rows (np.ndarray): indexes (or boolean mask) of the rows to keep.
+
+        Returns:
+            BuildsMatrix
+        """
+        matrix = BuildsMatrix(self._ids[rows], self._stats[rows], self._parts[rows])
+        for k, v in self._data.items():
+            matrix.setColumn(k, v[rows])
+
+        matrix._parent = self
+        matrix._parent_rows = np.arange(len(self))[rows]
+        return matrix
+
+    def sortById(self) -> BuildsMatrix:
+        """Return a new matrix with the same rows, sorted by build id.
+
+        Returns:
+            BuildsMatrix
+        """
+        order = np.argsort(self._ids, kind="stable")
+        matrix = BuildsMatrix(self._ids[order], self._stats[order], self._parts[order])
+        for k, v in self._data.items():
+            matrix.setColumn(k, v[order])
+
+        return matrix
+
+    def column(self, name: str) -> np.ndarray:
+        """Return a column of the matrix.
+
+        Args:
+            name (str): name of the column, either a part attribute \
+                or a data attribute.
+
+        Raises:
+            KeyError: the column does not exist.
+
+        Returns:
+            np.ndarray
+        """
+        if name in PARTS_ATTRIBUTES:
+            return self._stats[:, PARTS_ATTRIBUTES.index(name)]
+        if name == "id":
+            return self._ids
+
+        return self._data[name]
+
+    def columns(self, names: list[str]) -> np.ndarray:
+        """Return the stats of the builds relative to some part attributes.
+
+        Args:
+            names (list[str]): names of the part attributes.
+
+        Returns:
+            np.ndarray: array of shape (n, len(names)).
+        """
+        return self._stats[:, [PARTS_ATTRIBUTES.index(n) for n in names]]
+
+    def setColumn(self, name: str, values: np.ndarray) -> None:
+        """Set a computed column of the matrix.
+
+        Args:
+            name (str): name of the column.
+            values (np.ndarray): values of the column, shape (n,).
+        """
+        self._data[name] = values
+
+    def argsort(
+        self, sort: list[tuple[str, bool]], rows: np.ndarray = None
+    ) -> np.ndarray:
+        """Sort the rows of the matrix by multiple keys.
+
+        The first key is the most significant one. The sort is stable.
+
+        Args:
+            sort (list[tuple[str, bool]]): list of (column, descending) tuples.
+            rows (np.ndarray, optional): rows to sort. Defaults to None (all rows).
+
+        Returns:
+            np.ndarray: sorted indexes of the rows.
+        """
+        if rows is None:
+            rows = np.arange(len(self))
+
+        if not sort:
+            return rows
+
+        # lexsort uses the last key as the primary one
+        keys = [
+            -self.column(k)[rows] if descending else self.column(k)[rows]
+            for k, descending in sort[::-1]
+        ]
+        return rows[np.lexsort(keys)]
+
+    def topk(
+        self, sort: list[tuple[str, bool]], k: int, rows: np.ndarray = None
+    ) -> np.ndarray:
+        """Select the first k rows of the matrix sorted by multiple keys.
+
+        Only the rows that can be part of the result (the ones whose first key \
+            is at least as good as the k-th best one) are sorted.
+        The result is the same as the first k rows returned by argsort.
+
+        Args:
+            sort (list[tuple[str, bool]]): list of (column, descending) tuples.
+            k (int): number of rows to select.
+            rows (np.ndarray, optional): rows to select from. \
+                Defaults to None (all rows).
+
+        Returns:
+            np.ndarray: sorted indexes of the selected rows.
+        """
+        if rows is None:
+            rows = np.arange(len(self))
+
+        if not sort or k >= rows.shape[0]:
+            return self.argsort(sort, rows)[:k]
+        if k <= 0:
+            return rows[:0]
+
+        # find the k-th best value of the first key in linear time
+        key, descending = sort[0]
+        values = -self.column(key)[rows] if descending else self.column(key)[rows]
+        kth = np.partition(values, k - 1)[k - 1]
+
+        # ties with the k-th value are kept, so the other keys can break them
+        candidates = rows[values <= kth]
+        return self.argsort(sort, candidates)[:k]
+
+    def sortedAccess(self, attribute: str) -> np.ndarray:
+        """Return the rows of the matrix sorted by a part attribute, best first.
+
+        The list is computed once per attribute. If the matrix was taken from \
+            another one, the list is derived from the parent's list \
+            in linear time.
+
+        Args:
+            attribute (str): name of the part attribute.
+
+        Returns:
+            np.ndarray: indexes of the rows, in descending order of the attribute.
+        """
+        if attribute not in self._sorted_access:
+            if self._parent is None:
+                order = np.argsort(-self.column(attribute), kind="stable")
+            else:
+                # map the rows of the parent to the rows of this matrix
+                inverse = np.full(len(self._parent), -1, dtype=np.int64)
+                inverse[self._parent_rows] = np.arange(len(self))
+                order = inverse[self._parent.sortedAccess(attribute)]
+                order = order[order >= 0]
+
+            self._sorted_access[attribute] = order
+
+        return self._sorted_access[attribute]
+
+    def row(self, x: int) -> dict[str, int]:
+        """Return a single row of the matrix.
+
+        Args:
+            x (int): index of the row.
+
+        Returns:
+            dict[str, int]: id, stats and part ids of the build.
+        """
+        row = {"id": int(self._ids[x])}
+        row.update(zip(PARTS_ATTRIBUTES, self._stats[x].tolist()))
+        row.update(zip(ID_ATTRIBUTES, self._parts[x].tolist()))
+        return row
+
+    @property
+    def ids(self) -> np.ndarray:
+        """Return the ids of the builds.
+
+        Returns:
+            np.ndarray
+        """
+        return self._ids
+
+    @property
+    def stats(self) -> np.ndarray:
+        """Return the stats of the builds.
+
+        Returns:
+            np.ndarray
+        """
+        return self._stats
+
+    @property
+    def parts(self) -> np.ndarray:
+        """Return the ids of the parts of the builds.
+
+        Returns:
+            np.ndarray
+        """
+        return self._parts
@@ -1,6 +1,7 @@
 """Builds Printer Module."""
 
 import tomllib
+from typing import Iterable, TextIO
 
 from .entities import NamedBuild
 
@@ -9,55 +10,69 @@ class BuildsPrinter:
     """Class for printing builds."""
 
     @classmethod
-    def printCSV(cls, named_builds: list[NamedBuild]) -> None:
+    def printCSV(cls, named_builds: Iterable[NamedBuild], file: TextIO = None) -> None:
         """Print the builds as CSV.
 
         Args:
-            named_builds (list[NamedBuild])
+            named_builds (Iterable[NamedBuild])
+            file (TextIO, optional): where to print the builds. \
+                Defaults to None (standard output).
         """
         for x, b in enumerate(named_builds):
             if x == 0:
-                print(b.csvHeader())
-            print(b.csv)
+                print(b.csvHeader(), file=file)
+            print(b.csv, file=file)
 
     @classmethod
-    def printJSON(cls, named_builds: list[NamedBuild]) -> None:
+    def printJSON(cls, named_builds: Iterable[NamedBuild], file: TextIO = None) -> None:
         """Print the builds as JSON.
 
         Args:
-            named_builds (list[NamedBuild])
+            named_builds (Iterable[NamedBuild])
+            file (TextIO, optional): where to print the builds. \
+                Defaults to None (standard output).
         """
-        print(f"[{', '.join([b.json for b in named_builds])}")
+        print(f"[{', '.join([b.json for b in named_builds])}", file=file)
 
     @classmethod
-    def printJSONPretty(cls, named_builds: list[NamedBuild]) -> None:
+    def printJSONPretty(
+        cls, named_builds: Iterable[NamedBuild], file: TextIO = None
+    ) -> None:
         """Print the builds as pretty JSON.
 
         Args:
-            named_builds (list[NamedBuild])
+            named_builds (Iterable[NamedBuild])
+            file (TextIO, optional): where to print the builds. \
+                Defaults to None (standard output).
         """
-        print(f"[{', '.join([b.json_pretty for b in named_builds])}")
+        print(f"[{', '.join([b.json_pretty for b in named_builds])}", file=file)
 
     @classmethod
-    def printMarkdown(cls, named_builds: list[NamedBuild]) -> None:
+    def printMarkdown(
+        cls, named_builds: Iterable[NamedBuild], file: TextIO = None
+    ) -> None:
         """Print the builds as Markdown table.
 
         Args:
-            named_builds (list[NamedBuild])
+            named_builds (Iterable[NamedBuild])
+            file (TextIO, optional): where to print the builds. \
+                Defaults to None (standard output).
         """
         for x, b in enumerate(named_builds):
             if x == 0:
-                print(b.markdownHeader())
-            print(b.markdown)
+                print(b.markdownHeader(), file=file)
+            print(b.markdown, file=file)
 
     @classmethod
-    def printTOML(cls, named_builds: list[NamedBuild]) -> None:
+    def printTOML(cls, named_builds: Iterable[NamedBuild], file: TextIO = None) -> None:
         """Print the builds as TOML.
 
         Args:
-            named_builds (list[NamedBuild])
+            named_builds (Iterable[NamedBuild])
+            file (TextIO, optional): where to print the builds. \
+                Defaults to None (standard output).
         """
-        print(tomllib.dumps([b.toDict() for b in named_builds]))
+        print(tomllib.dumps([b.toDict() for b in named_builds]), file=file)
 
     @classmethod
     def getPrinters(cls) -> dict[str, callable]:
@@ -0,0 +1,107 @@
+"""This module contains the caches used in the program."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class LRUCache:
+    """Bounded cache discarding the least recently used items first."""
+
+    def __init__(self, max_size: int = 128) -> LRUCache:
+        """Create a cache.
+
+        Args:
+            max_size (int, optional): maximum number of items in the cache. \
+                Defaults to 128.
+
+        Raises:
+            ValueError: max_size is less than 1.
+        """
+        if max_size < 1:
+            raise ValueError(f"{max_size} is not a valid cache size")
+
+        self._max_size = max_size
+        self._items = OrderedDict()
+        # usage statistics, to size the cache
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Check if a key is in the cache, without marking it as used.
+
+        Args:
+            key (Hashable)
+
+        Returns:
+            bool
+        """
+        return key in self._items
+
+    def __len__(self) -> int:
+        """Return the number of items in the cache.
+
+        Returns:
+            int
+        """
+        return len(self._items)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get an item from the cache, marking it as the most recently used.
+
+        Args:
+            key (Hashable)
+            default (Any, optional): value returned if the key is not in the cache. \
+                Defaults to None.
+
+        Returns:
+            Any
+        """
+        if key not in self._items:
+            self._misses += 1
+            return default
+
+        self._hits += 1
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Put an item in the cache, evicting the least recently used one if full.
+
+        Args:
+            key (Hashable)
+            value (Any)
+        """
+        self._items[key] = value
+        self._items.move_to_end(key)
+
+        if len(self._items) > self._max_size:
+            self._items.popitem(last=False)
+            self._evictions += 1
+
+    def clear(self) -> None:
+        """Remove all the items from the cache, keeping its statistics."""
+        self._items.clear()
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        """Get the usage statistics of the cache.
+
+        Only get counts as a hit or a miss, checking if a key is in the \
+            cache does not.
+
+        Returns:
+            dict[str, int | float]: number of items, maximum number of items, \
+                hits, misses, evicted items and hit rate (0 if never used).
+        """
+        lookups = self._hits + self._misses
+        return {
+            "size": len(self._items),
+            "max_size": self._max_size,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "hit_rate": self._hits / lookups if lookups else 0,
+        }
@@ -0,0 +1,298 @@
+"""This module contains the engine used to cluster the builds."""
+
+from __future__ import annotations
+
+from enum import Enum
+
+import numpy as np
+
+
+class KMeansMode(Enum):
+    """Strategies available to update the centroids."""
+
+    LLOYD = "lloyd"
+    MINI_BATCH = "mini-batch"
+
+
+class KMeans:
+    """Cluster a set of points with the k-means algorithm.
+
+    Centroids are seeded with k-means++ and then updated either with \
+        Lloyd's algorithm (on all the points at each iteration) or \
+        with mini-batches of random points.
+    """
+
+    def __init__(
+        self,
+        mode: KMeansMode = KMeansMode.LLOYD,
+        max_iterations: int = 100,
+        tolerance: float = 1e-4,
+        batch_size: int = 1024,
+    ) -> KMeans:
+        """Create a k-means engine.
+
+        Args:
+            mode (KMeansMode, optional): strategy used to update the centroids. \
+                Defaults to KMeansMode.LLOYD.
+            max_iterations (int, optional): maximum number of iterations. \
+                Defaults to 100.
+            tolerance (float, optional): the algorithm stops when no centroid \
+                moves more than this distance. Defaults to 1e-4.
+            batch_size (int, optional): number of points in each mini-batch. \
+                Defaults to 1024.
+        """
+        self._modes = {
+            KMeansMode.LLOYD.value: self._lloyd,
+            KMeansMode.MINI_BATCH.value: self._miniBatch,
+        }
+        self._mode = mode
+        self._max_iterations = max_iterations
+        self._tolerance = tolerance
+        self._batch_size = batch_size
+
+    def setMode(self, mode: KMeansMode) -> None:
+        """Set the strategy used to update the centroids.
+
+        Args:
+            mode (KMeansMode)
+        """
+        self._mode = mode
+
+    def fit(
+        self, points: np.ndarray, k: int, seed: int = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Cluster the points.
+
+        Args:
+            points (np.ndarray): points of shape (n, d).
+            k (int): number of clusters.
+            seed (int, optional): seed of the random number generator. \
+                Defaults to None.
+
+        Raises:
+            ValueError: no dimension is provided or k is not valid.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: centroids of shape (k, d) and \
+                cluster of each point, of shape (n,).
+        """
+        if points.shape[1] == 0:
+            raise ValueError(
+                "At least one attribute must be provided for the k-means query"
+            )
+        if not 0 < k <= points.shape[0]:
+            raise ValueError(f"{k} is not a valid number of clusters")
+
+        rng = np.random.default_rng(seed)
+
+        # identical points are clustered once, weighted by their number
+        unique, inverse, counts = np.unique(
+            points, axis=0, return_inverse=True, return_counts=True
+        )
+        unique = unique.astype(np.float64)
+
+        centroids = self._seed(unique, counts, k, rng)
+        centroids = self._modes[self._mode.value](unique, counts, centroids, rng)
+        labels = self._assign(unique, centroids)
+        return centroids, labels[inverse.reshape(-1)]
+
+    def closest(
+        self, points: np.ndarray, centroids: np.ndarray, labels: np.ndarray
+    ) -> np.ndarray:
+        """Find the point of each cluster closest to its centroid.
+
+        Args:
+            points (np.ndarray): points of shape (n, d).
+            centroids (np.ndarray): centroids of shape (k, d).
+            labels (np.ndarray): cluster of each point, shape (n,).
+
+        Returns:
+            np.ndarray: index of the closest point to each centroid, \
+                for each non empty cluster.
+        """
+        distances = self._distances(points.astype(np.float64), centroids)
+        # only the points in the cluster are considered
+        distances[labels[:, None] != np.arange(centroids.shape[0])[None, :]] = np.inf
+
+        clusters = np.unique(labels)
+        return np.argmin(distances[:, clusters], axis=0)
+
+    def _distances(self, points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Compute the squared distances between points and centroids.
+
+        Args:
+            points (np.ndarray): points of shape (n, d).
+            centroids (np.ndarray): centroids of shape (k, d).
+
+        Returns:
+            np.ndarray: squared distances, shape (n, k).
+        """
+        distances = (
+            np.sum(points**2, axis=1)[:, None]
+            - 2 * points @ centroids.T
+            + np.sum(centroids**2, axis=1)[None, :]
+        )
+        # rounding errors can make the distances slightly negative
+        return np.maximum(distances, 0)
+
+    def _assign(self, points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Assign each point to the closest centroid.
+
+        Args:
+            points (np.ndarray): points of shape (n, d).
+            centroids (np.ndarray): centroids of shape (k, d).
+
+        Returns:
+            np.ndarray: cluster of each point, shape (n,).
+        """
+        return np.argmin(self._distances(points, centroids), axis=1)
+
+    def _sums(
+        self, points: np.ndarray, counts: np.ndarray, labels: np.ndarray, k: int
+    ) -> np.ndarray:
+        """Sum the points assigned to each cluster.
+
+        Args:
+            points (np.ndarray): points of shape (n, d).
+            counts (np.ndarray): number of times each point appears, shape (n,).
+            labels (np.ndarray): cluster of each point, shape (n,).
+            k (int): number of clusters.
+
+        Returns:
+            np.ndarray: sum of the points of each cluster, shape (k, d).
+        """
+        return np.stack(
+            [np.bincount(labels, weights=p * counts, minlength=k) for p in points.T],
+            axis=1,
+        )
+
+    def _seed(
+        self, points: np.ndarray, counts: np.ndarray, k: int, rng: np.random.Generator
+    ) -> np.ndarray:
+        """Choose the initial centroids with k-means++.
+
+        Each centroid is a point, chosen with probability proportional \
+            to its squared distance from the closest centroid chosen so far.
+
+        Args:
+            points (np.ndarray): points of shape (n, d).
+            counts (np.ndarray): number of times each point appears, shape (n,).
+            k (int): number of clusters.
+            rng (np.random.Generator)
+
+        Returns:
+            np.ndarray: centroids of shape (k, d).
+        """
+        centroids = np.empty((k, points.shape[1]))
+        centroids[0] = points[rng.choice(points.shape[0], p=counts / counts.sum())]
+        closest = self._distances(points, centroids[:1])[:, 0]
+
+        for c in range(1, k):
+            total = (closest * counts).sum()
+            if total == 0:
+                # every point is already a centroid
+                x = rng.integers(points.shape[0])
+            else:
+                x = rng.choice(points.shape[0], p=closest * counts / total)
+
+            centroids[c] = points[x]
+            closest = np.minimum(
+                closest, self._distances(points, centroids[c : c + 1])[:, 0]
+            )
+
+        return centroids
+
+    def _lloyd(
+        self,
+        points: np.ndarray,
+        counts: np.ndarray,
+        centroids: np.ndarray,
+        rng: np.random.Generator,
+    ) -> np.ndarray:
+        """Update the centroids with Lloyd's algorithm.
+
+        Args:
+            points (np.ndarray): points of shape (n, d).
+            counts (np.ndarray): number of times each point appears, shape (n,).
+            centroids (np.ndarray): initial centroids of shape (k, d).
+            rng (np.random.Generator)
+
+        Returns:
+            np.ndarray: final centroids of shape (k, d).
+        """
+        k = centroids.shape[0]
+
+        for _ in range(self._max_iterations):
+            labels = self._assign(points, centroids)
+            sizes = np.bincount(labels, weights=counts, minlength=k)
+
+            sums = self._sums(points, counts, labels, k)
+
+            new_centroids = centroids.copy()
+            new_centroids[sizes > 0] = sums[sizes > 0] / sizes[sizes > 0, None]
+
+            # move empty clusters to random points
+            empty = np.flatnonzero(sizes == 0)
+            new_centroids[empty] = points[
+                rng.integers(points.shape[0], size=empty.shape[0])
+            ]
+
+            shift = np.max(np.linalg.norm(new_centroids - centroids, axis=1))
+            centroids = new_centroids
+
+            if shift <= self._tolerance:
+                break
+
+        return centroids
+
+    def _miniBatch(
+        self,
+        points: np.ndarray,
+        counts: np.ndarray,
+        centroids: np.ndarray,
+        rng: np.random.Generator,
+    ) -> np.ndarray:
+        """Update the centroids with mini-batches of random points.
+
+        Each centroid moves towards the points of the batch assigned to it, \
+            with a learning rate decreasing with the number of points it received.
+
+        Args:
+            points (np.ndarray): points of shape (n, d).
+            counts (np.ndarray): number of times each point appears, shape (n,).
+            centroids (np.ndarray): initial centroids of shape (k, d).
+            rng (np.random.Generator)
+
+        Returns:
+            np.ndarray: final centroids of shape (k, d).
+        """
+        k = centroids.shape[0]
+        received = np.zeros(k)
+        probabilities = counts / counts.sum()
+        ones = np.ones(self._batch_size)
+
+        for _ in range(self._max_iterations):
+            batch = points[
+                rng.choice(points.shape[0], self._batch_size, p=probabilities)
+            ]
+            labels = self._assign(batch, centroids)
+            sizes = np.bincount(labels, minlength=k)
+
+            sums = self._sums(batch, ones, labels, k)
+
+            received += sizes
+            moved = sizes > 0
+            rate = sizes[moved, None] / received[moved, None]
+
+            new_centroids = centroids.copy()
+            new_centroids[moved] += rate * (
+                sums[moved] / sizes[moved, None] - centroids[moved]
+            )
+
+            shift = np.max(np.linalg.norm(new_centroids - centroids, axis=1))
+            centroids = new_centroids
+
+            if shift <= self._tolerance:
+                break
+
+        return centroids
@@ -26,6 +26,15 @@ TABLE_NAMES = {
     EntityId.BUILD: "builds",
 }
 
+# Directory of the binary snapshot of the builds
+SNAPSHOT_PATH = "builds_snapshot"
+
+# Name of the table caching the skylines
+SKYLINE_CACHE_TABLE = "skyline_cache"
+
+# Name of the table caching the results of the queries
+RESULT_CACHE_TABLE = "result_cache"
+
 # Name of the columns in the database
 PARTS_ATTRIBUTES = [
     "ground_speed",
@@ -44,6 +53,19 @@ PARTS_ATTRIBUTES = [
     "invincibility",
 ]
 
+# Attributes of the builds filtered together most often, indexed together \
+#   on top of the index each part attribute has on its own
+BUILDS_COMPOSITE_INDEXES = [
+    ["ground_speed", "acceleration"],
+    ["ground_speed", "miniturbo"],
+    ["acceleration", "miniturbo"],
+    ["ground_speed", "ground_handling"],
+]
+
+# Decimals the scores are rounded to, so that the same score is found whatever \
+#   the order the weighted stats are added in, by NumPy or by SQLite
+SCORE_DECIMALS = 9
+
 # ID-related attributes
 ID_ATTRIBUTES = ["driver_id", "vehicle_id", "tyre_id", "glider_id"]
 # Score-related attributes
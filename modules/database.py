@@ -2,55 +2,120 @@
 
 from __future__ import annotations
 
+import os
 import sqlite3
-from re import Match, match
+from contextlib import contextmanager
+from dataclasses import replace
+from hashlib import sha1
+from typing import Iterable, Iterator
+
+import numpy as np
+from ujson import dumps, loads
 
 from .algorithms import AlgorithmName, Algorithms
+from .build_query import QUERY_PREFIXES, BuildQuery, QueryPlan
+from .builds_matrix import BuildsMatrix
+from .cache import LRUCache
+from .clustering import KMeansMode
 from .constants import (
     DATA_ATTRIBUTES,
-    ID_ATTRIBUTES,
     PARTS_ATTRIBUTES,
+    RESULT_CACHE_TABLE,
+    SCORE_DECIMALS,
+    SKYLINE_CACHE_TABLE,
+    SNAPSHOT_PATH,
     TABLE_NAMES,
     EntityId,
 )
 from .entities import Build, Entity, NamedBuild, PartFactory
+from .query import QueryBuilder
+from .scoring import ScoringEngine
+from .search import BuildSearch
+from .skyline import SkylineMode
 
 
 class Database:
     """Class handling a generic database."""
 
-    def __init__(self, path: str) -> Database:
+    def __init__(
+        self, path: str, cached_statements: int = 256, read_only: bool = False
+    ) -> Database:
         """Create a database object.
 
         Args:
             path (str): Path to the SQLite database file.
+            cached_statements (int, optional): number of prepared statements \
+                the connection keeps, indexed by the text of their query. \
+                Defaults to 256.
+            read_only (bool, optional): open the database in read only mode. \
+                The connection can then be used by any thread, one at a time. \
+                Defaults to False.
         """
         self._path = path
-        self._con = sqlite3.connect(self._path)
+        self._read_only = read_only
+        if read_only:
+            self._con = sqlite3.connect(
+                f"file:{self._path}?mode=ro",
+                cached_statements=cached_statements,
+                uri=True,
+                check_same_thread=False,
+            )
+        else:
+            self._con = sqlite3.connect(self._path, cached_statements=cached_statements)
         self._cur = self._con.cursor()
 
-    def query(self, q: str) -> list:
+    def query(self, q: str, params: tuple = ()) -> list:
         """Make a query to the database.
 
         Args:
             q (str): Query to make to the database.
+            params (tuple, optional): values bound to the placeholders \
+                of the query. Defaults to ().
 
         Returns:
             list: Result of the query.
         """
-        self._cur.execute(q)
+        self._cur.execute(q, params)
         return self._cur.fetchall()
 
-    def getCols(self, q: str) -> list[str]:
+    def stream(
+        self, q: str, params: tuple = (), batch_size: int = 1024
+    ) -> Iterator[list[tuple]]:
+        """Make a query to the database, reading the result in batches.
+
+        The query runs on its own cursor, so other queries can be made \
+            while the result is read.
+
+        Args:
+            q (str): Query to make to the database.
+            params (tuple, optional): values bound to the placeholders \
+                of the query. Defaults to ().
+            batch_size (int, optional): number of rows in each batch. \
+                Defaults to 1024.
+
+        Yields:
+            list[tuple]: rows of the result, at most batch_size at a time.
+        """
+        cur = self._con.cursor()
+        try:
+            cur.execute(q, params)
+            while rows := cur.fetchmany(batch_size):
+                yield rows
+        finally:
+            cur.close()
+
+    def getCols(self, q: str, params: tuple = ()) -> list[str]:
         """Get the column names relative to a query in the database.
 
         Args:
             q (str): Query to make to the database.
+            params (tuple, optional): values bound to the placeholders \
+                of the query. Defaults to ().
 
         Returns:
             list[str]: list of column names.
         """
-        self._cur.execute(q)
+        self._cur.execute(q, params)
         return [i[0] for i in self._cur.description]
 
     def tableExists(self, table: str) -> bool:
@@ -62,8 +127,8 @@ class Database:
         Returns:
             bool: True if the table exists, False otherwise.
         """
-        q = f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table}'"
-        return bool(self.query(q))
+        q = "SELECT name FROM sqlite_master WHERE type='table' AND name=?"
+        return bool(self.query(q, (table,)))
 
     def deleteTable(self, table: str):
         """Delete (drop) a table from the database.
@@ -95,6 +160,57 @@ class Database:
         q = f"CREATE TABLE {table} ({', '.join(cols_typed)}, PRIMARY KEY ({pk}))"
         self._cur.execute(q)
 
+    def createIndex(self, table: str, cols: list, name: str = None):
+        """Create an index on some columns of a table, if it does not exist.
+
+        Args:
+            table (str): name of the table to index.
+            cols (list): columns of the index, the most significant first.
+            name (str, optional): name of the index. \
+                Defaults to None (idx_<table>_<columns>).
+        """
+        if name is None:
+            name = f"idx_{table}_{'_'.join(cols)}"
+
+        q = f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(cols)})"
+        self._cur.execute(q)
+
+    def getIndexes(self, table: str) -> list[str]:
+        """Get the names of the indexes created on a table.
+
+        The indexes SQLite creates for the primary keys are not included.
+
+        Args:
+            table (str): name of the table.
+
+        Returns:
+            list[str]: list of index names.
+        """
+        q = (
+            "SELECT name FROM sqlite_master WHERE type='index' "
+            "AND tbl_name=? AND sql IS NOT NULL"
+        )
+        return [r[0] for r in self.query(q, (table,))]
+
+    def dropIndexes(self, table: str):
+        """Drop all the indexes created on a table.
+
+        Args:
+            table (str): name of the table.
+        """
+        for name in self.getIndexes(table):
+            self._cur.execute(f"DROP INDEX {name}")
+
+    def analyze(self, table: str = None):
+        """Collect the statistics the query planner uses to choose the indexes.
+
+        Args:
+            table (str, optional): name of the table to analyze. \
+                Defaults to None (the whole database).
+        """
+        self._cur.execute("ANALYZE" if table is None else f"ANALYZE {table}")
+        self.commitChanges()
+
     def insert(self, table: str, cols: list, values: list):
         """Insert a row in a table.
 
@@ -103,44 +219,104 @@ class Database:
             cols (list): name of the columns to insert into.
             values (list): values to insert.
         """
-        q = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ("
+        self._cur.execute(self._insertQuery(table, cols), values)
 
-        for v in values:
-            if isinstance(v, str):
-                q += f"'{v}',"
-            else:
-                q += f"{v},"
+    def insertMany(self, table: str, cols: list, rows: Iterable[list]):
+        """Insert many rows in a table, in a single transaction.
 
-        q = q[:-1] + ")"
+        The transaction is committed if all the rows are inserted, \
+            rolled back otherwise.
 
-        self._cur.execute(q)
+        Args:
+            table (str): name of the table to insert into.
+            cols (list): name of the columns to insert into.
+            rows (Iterable[list]): values to insert, one list per row.
+        """
+        with self._con:
+            self._cur.executemany(self._insertQuery(table, cols), rows)
+
+    @contextmanager
+    def bulkLoad(self, unsafe: bool = False) -> Iterator[Database]:
+        """Context to load a large amount of data in the database.
+
+        Args:
+            unsafe (bool, optional): disable the rollback journal and the \
+                disk syncs for the duration of the load. Faster, but the \
+                database may be corrupted if the process crashes. \
+                Only meant for offline rebuilds. Defaults to False.
+
+        Yields:
+            Database: the database itself.
+        """
+        if not unsafe:
+            yield self
+            self.commitChanges()
+            return
+
+        self.commitChanges()
+        journal_mode = self.query("PRAGMA journal_mode")[0][0]
+        synchronous = self.query("PRAGMA synchronous")[0][0]
+        self._cur.execute("PRAGMA journal_mode = OFF")
+        self._cur.execute("PRAGMA synchronous = OFF")
+
+        try:
+            yield self
+            self.commitChanges()
+        finally:
+            self._cur.execute(f"PRAGMA journal_mode = {journal_mode}")
+            self._cur.execute(f"PRAGMA synchronous = {synchronous}")
+
+    def _insertQuery(self, table: str, cols: list) -> str:
+        """Build a parameterized query to insert a row in a table.
+
+        Args:
+            table (str): name of the table to insert into.
+            cols (list): name of the columns to insert into.
+
+        Returns:
+            str: query with a placeholder for each column.
+        """
+        return (
+            f"INSERT INTO {table} ({', '.join(cols)}) "
+            f"VALUES ({', '.join('?' for _ in cols)})"
+        )
 
     def commitChanges(self):
         """Apply changes to the database."""
         self._con.commit()
 
+    def close(self):
+        """Close the connection to the database."""
+        self._con.close()
+
 
 class MK8Deluxe(Database):
     """Class handling the MK8 Deluxe database."""
 
-    def __init__(self) -> MK8Deluxe:
-        """Create a MK8Deluxe object."""
-        super().__init__("MK8D")
+    def __init__(self, read_only: bool = False) -> MK8Deluxe:
+        """Create a MK8Deluxe object.
 
-    def _buildQuery(self, entity: EntityId) -> str:
-        """Build a string query to get the data from the database.
+        Args:
+            read_only (bool, optional): open the database in read only mode. \
+                Defaults to False.
+        """
+        super().__init__("MK8D", read_only=read_only)
+
+    def _buildQuery(self, entity: EntityId) -> tuple[str, tuple]:
+        """Build a query to get the data from the database.
 
         Args:
             entity (EntityId): Id of the entity to query.
 
         Returns:
-            str: Query to pass to the database.
+            tuple[str, tuple]: query to pass to the database and its values.
         """
-        return (
+        q = (
             f"select d.id as {entity.value}_id, "
             f"{', '.join(PARTS_ATTRIBUTES)} "
             f"from {TABLE_NAMES[entity]} as d"
         )
+        return q, ()
 
     def _queryEntities(
         self,
@@ -154,12 +330,47 @@ class MK8Deluxe(Database):
         Returns:
             list[dict[str, float | str]]: list of dictionaries containing the data.
         """
-        query = self._buildQuery(entity)
-        rows = self.query(query)
-        cols = self.getCols(query)
+        query, params = self._buildQuery(entity)
+        rows = self.query(query, params)
+        cols = self.getCols(query, params)
 
         return [dict(zip(cols, row)) for row in rows]
 
+    def partMatrix(self, entity: EntityId) -> tuple[np.ndarray, np.ndarray]:
+        """Load all the parts of an entity as arrays.
+
+        Args:
+            entity (EntityId): Id of the entity to query.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: ids of the parts, of shape (p,), \
+                and their stats, of shape (p, len(PARTS_ATTRIBUTES)).
+        """
+        q = f"SELECT id, {', '.join(PARTS_ATTRIBUTES)} FROM {TABLE_NAMES[entity]}"
+        rows = self.query(q)
+        table = np.array(rows, dtype=np.int64).reshape(len(rows), -1)
+        return table[:, 0], table[:, 1:]
+
+    def partNames(self) -> dict[EntityId, dict[int, list[str]]]:
+        """Load the names of all the parts, one query per part table.
+
+        Returns:
+            dict[EntityId, dict[int, list[str]]]: names of each part, \
+                indexed by entity and part id.
+        """
+        names = {}
+        for e in EntityId:
+            # skip the build Entities as they are not named
+            if e == EntityId.BUILD:
+                continue
+
+            names[e] = {}
+            q = f"SELECT E.NAME, E.ID FROM {TABLE_NAMES[e]}_names AS E"
+            for name, code in self.query(q):
+                names[e].setdefault(code, []).append(name)
+
+        return names
+
     def __getattr__(self, __name: str) -> list[Entity]:
         """Get an entity from the database.
 
@@ -183,210 +394,306 @@ class MK8Deluxe(Database):
 class MK8DeluxeBuilds(MK8Deluxe):
     """Class handling the MK8Deluxe builds database."""
 
-    def __init__(self) -> MK8DeluxeBuilds:
-        """Create a MK8DeluxeBuilds object."""
-        super().__init__()
+    def __init__(
+        self,
+        persistent_cache: bool = False,
+        virtual: bool = False,
+        streaming: bool = False,
+        workers: int = 1,
+        snapshot: bool = False,
+        read_only: bool = False,
+        result_cache_size: int = 0,
+    ) -> MK8DeluxeBuilds:
+        """Create a MK8DeluxeBuilds object.
+
+        Args:
+            persistent_cache (bool, optional): save the computed skylines \
+                and the results of the queries with a limit in the database \
+                too. Defaults to False.
+            virtual (bool, optional): compute the builds from the part tables \
+                instead of reading the builds table. Defaults to False.
+            streaming (bool, optional): answer the top-k queries reading \
+                the builds table in batches, keeping only the best builds \
+                found so far, instead of loading (and caching) all the builds. \
+                Defaults to False.
+            workers (int, optional): number of processes running the top-k \
+                and skyline algorithms. Defaults to 1.
+            snapshot (bool, optional): map the binary snapshot written by \
+                create_builds.py in memory instead of reading the builds table. \
+                Defaults to False.
+            read_only (bool, optional): open the database in read only mode, \
+                so that the object can be used by any thread, one at a time. \
+                The computed skylines and results are then never saved. \
+                Defaults to False.
+            result_cache_size (int, optional): number of results of the \
+                queries with a limit kept in memory, 0 to keep none. \
+                Defaults to 0.
+        """
+        super().__init__(read_only=read_only)
         self._algorithms = Algorithms()
-        self._sql_filter = []  # filter for attributes
-        self._data_filter = []  # filter for data attributes such as score or stddev
-        self._sort = []  # list of attributes to sort by
-        self._limit = None
-        self._seed = None
-
-        # weights of the attributes for the score calculation
-        self._weights = {k: 0 for k in PARTS_ATTRIBUTES}
-        # attributes to consider for the skyline query
-        self._rank_attributes = dict.fromkeys(PARTS_ATTRIBUTES, False)
-
-    def _buildQuery(self, *_) -> str:
+        self._algorithms.setWorkers(workers)
+        # parameters of the query, compiled to the plan used to run it
+        self._query = BuildQuery()
+        # names of the parts, indexed by entity and part id
+        self._names = None
+        # scoring engine of the loaded builds and the query used to load them
+        self._scoring = None
+        self._scoring_query = None
+        # ids of the builds in the skylines already computed, by query
+        self._skyline_cache = LRUCache(64)
+        self._persistent_cache = persistent_cache
+        self._virtual = virtual
+        self._streaming = streaming
+        self._snapshot = snapshot
+        # builds mapped from the snapshot, loaded once
+        self._snapshot_builds = None
+        # branch and bound search over the parts, created on first use
+        self._search = None
+        # results of the queries, by normalized query and database fingerprint
+        self._results = LRUCache(result_cache_size) if result_cache_size else None
+        self._persistent_stats = {"hits": 0, "misses": 0}
+        # version of the database at the last query, and fingerprint of its data
+        self._data_version = None
+        self._fingerprint = None
+
+    def resetQuery(self) -> None:
+        """Forget the filters, sorts, weights, ranking attributes, limit, \
+            seed and algorithm of the query.
+
+        The loaded builds, the names of the parts and the computed scores \
+            and skylines are kept, so that a new query can reuse them.
+        """
+        self.applyQuery(BuildQuery())
+
+    def applyQuery(self, query: BuildQuery) -> None:
+        """Replace the parameters of the query with the ones of a BuildQuery.
+
+        Args:
+            query (BuildQuery)
+
+        Raises:
+            AttributeError: a filter, sort, weight or ranking attribute \
+                is not valid.
+            TypeError: a weight, the limit or the seed is not valid.
+            ValueError: a weight is less than 0.
+        """
+        # compile the query first, so an invalid one leaves the current in place
+        plan = query.plan
+
+        # the algorithms are set up again only if they changed
+        current = self._query.plan
+        if (plan.algorithm, plan.skyline_mode, plan.kmeans_mode) != (
+            current.algorithm,
+            current.skyline_mode,
+            current.kmeans_mode,
+        ):
+            self._algorithms.resetAlgorithm()
+            if plan.algorithm is not None:
+                self._algorithms.setAlgorithm(plan.algorithm)
+            if plan.skyline_mode is not None:
+                self._algorithms.setSkylineMode(plan.skyline_mode)
+            if plan.kmeans_mode is not None:
+                self._algorithms.setKMeansMode(plan.kmeans_mode)
+
+        self._query = query
+
+    def _buildQuery(self, *_) -> tuple[str, tuple]:
         """Build a query to get the data from the database.
 
+        The values of the filters are bound to the query, so queries \
+            filtering the same attributes share the same prepared statement.
+        Builds are not sorted, so that SQLite can read them through the index \
+            of a filtered attribute instead of scanning the whole table.
+
+        Returns:
+            tuple[str, tuple]: query to pass to the database and its values.
+        """
+        query = QueryBuilder("builds", "b").filter(self._plan.sql_filter)
+        return query.build()
+
+    def _loadNames(self) -> dict[EntityId, dict[int, list[str]]]:
+        """Load the names of all the parts, from the snapshot if in use.
+
         Returns:
-            str: query to pass to the database.
+            dict[EntityId, dict[int, list[str]]]: names of each part, \
+                indexed by entity and part id.
         """
-        q = "SELECT * FROM builds AS b "
+        if not self._snapshot:
+            return self.partNames()
 
-        # add filters to the query
-        if self._sql_filter:
-            q += f"where {' and '.join(self._sql_filter)}"
+        with open(os.path.join(SNAPSHOT_PATH, "names.json")) as f:
+            names = loads(f.read())
 
-        return q
+        return {
+            EntityId(e): {int(code): n for code, n in parts.items()}
+            for e, parts in names.items()
+        }
 
-    def _setFilter(self, match: Match, value: int) -> None:
-        """Set a filter for the query.
+    def _loadMatrix(self) -> BuildsMatrix:
+        """Load the builds matching the SQL filters into a columnar matrix.
 
-        Args:
-            match (Match): Match object containing the filter.
-            value (int): Value of the filter.
+        The matrix is loaded again only if the SQL filters change.
 
-        Raises:
-            AttributeError: Filter is not valid.
+        Returns:
+            BuildsMatrix
         """
-        # filter any part attribute
-        # these filters are passed to the SQL query
-        if match.group(2) in PARTS_ATTRIBUTES:
-            # differentiate between min and max
-            match match.group(1):
-                case "min":
-                    self._sql_filter.append(f"b.{match.group(2)} >= {value}")
-                case "max":
-                    self._sql_filter.append(f"b.{match.group(2)} <= {value}")
-            return
+        query = self._buildQuery()
 
-        # filter any data attribute
-        # these filters are passed to the data after the query
-        if match.group(2) in DATA_ATTRIBUTES:
-            match match.group(1):
-                case "min":
-                    self._data_filter.append(
-                        lambda x: x.__getattribute__(match.group(2)) >= value
-                    )
-                case "max":
-                    self._data_filter.append(
-                        lambda x: x.__getattribute__(match.group(2)) <= value
-                    )
+        if self._scoring is None or self._scoring_query != query:
+            if self._virtual:
+                builds = self._loadVirtualMatrix()
+            elif self._snapshot:
+                builds = self._loadSnapshotMatrix()
+            else:
+                # the rows come in the order of the index used to filter them
+                builds = BuildsMatrix.fromBatches(
+                    self.stream(*query), self.getCols(*query)
+                ).sortById()
 
-            return
+            self._scoring = ScoringEngine(builds)
+            self._scoring_query = query
 
-        # raise error for invalid filter
-        raise AttributeError(f"{match.group(2)} is not a valid filter")
+        return self._scoring.builds
 
-    def _setSort(self, match: Match, direction: int) -> None:
-        """Set a sort for the query.
+    def _filterMatrix(
+        self, builds: BuildsMatrix, filters: list[tuple[str, str, int]] = None
+    ) -> BuildsMatrix:
+        """Apply some filters to the builds.
 
         Args:
-            match (Match): Match object containing the sort.
-            direction (int): Direction of the sort (1 ascending, -1 descending).
+            builds (BuildsMatrix)
+            filters (list[tuple[str, str, int]], optional): list of \
+                (attribute, "min" or "max", value) filters. \
+                Defaults to None (the data filters).
 
-        Raises:
-            AttributeError: sort is not valid.
+        Returns:
+            BuildsMatrix: builds matching all the filters.
         """
-        if match.group(1) in PARTS_ATTRIBUTES + DATA_ATTRIBUTES and direction in [
-            -1,
-            1,
-        ]:
-            self._sort.append((match.group(1), direction == -1))
-            return
+        if filters is None:
+            filters = self._plan.data_filter
 
-        raise AttributeError(f"{match.group(1)} is not a valid sort")
+        mask = np.ones(len(builds), dtype=bool)
+        for attribute, bound, value in filters:
+            # differentiate between min and max
+            match bound:
+                case "min":
+                    mask &= builds.column(attribute) >= value
+                case "max":
+                    mask &= builds.column(attribute) <= value
 
-    def _setWeight(self, match: Match, value: float) -> None:
-        """Set weight for score calculation for a specific attribute.
+        return builds.take(mask)
 
-        Args:
-            match (Match): Match object containing the attribute.
-            value (float): Weight of the attribute.
+    def _partMatrices(self) -> list[tuple[np.ndarray, np.ndarray]]:
+        """Load the ids and stats of each kind of part, in the order of the builds.
 
-        Raises:
-            AttributeError: Attribute is not valid.
-            TypeError: Value is not a float.
-            ValueError: Value is less than 0.
+        Returns:
+            list[tuple[np.ndarray, np.ndarray]]
         """
-        if match.group(1) not in PARTS_ATTRIBUTES:
-            raise AttributeError(f"{match.group(1)} is not a valid weight")
+        return [
+            self.partMatrix(e)
+            for e in [EntityId.DRIVER, EntityId.VEHICLE, EntityId.TYRE, EntityId.GLIDER]
+        ]
 
-        if not isinstance(value, float):
-            raise TypeError(f"{value} is not a valid weight")
-        if value < 0:
-            raise ValueError(f"{value} is not a valid weight")
+    def _loadVirtualMatrix(self) -> BuildsMatrix:
+        """Compute the builds matching the SQL filters from the part tables.
 
-        self._weights[match.group(1)] = value
+        The builds table is never read: each kind of part is pruned with \
+            the bounds of the filters, then the remaining parts are combined.
+        Ids are the same the builds have in the builds table.
 
-    def _setRankingAttribute(self, match: Match, value: int) -> None:
-        """Set a ranking attribute.
+        Returns:
+            BuildsMatrix
+        """
+        parts = self._partMatrices()
+        keep = BuildsMatrix.pruneParts(parts, self._plan.sql_filter)
+        pruned = [(ids[k], stats[k]) for (ids, stats), k in zip(parts, keep)]
+        builds = BuildsMatrix.fromParts(pruned)
+
+        # the id of a build is its position in the nested loops over all the parts
+        grid = np.meshgrid(*keep, indexing="ij")
+        ids = np.ravel_multi_index(
+            tuple(g.reshape(-1) for g in grid), tuple(p[0].shape[0] for p in parts)
+        )
+        builds = BuildsMatrix(ids, builds.stats, builds.parts)
 
-        Args:
-            match (Match): Match object containing the attribute.
-            value (int): Value of the attribute.
+        return self._filterMatrix(builds, self._plan.sql_filter)
 
-        Raises:
-            AttributeError: Attribute is not valid.
-        """
-        if match.group(1) not in PARTS_ATTRIBUTES:
-            raise AttributeError(f"{match.group(1)} is not a valid attributes")
+    def _loadSnapshotMatrix(self) -> BuildsMatrix:
+        """Map the builds of the snapshot matching the SQL filters.
 
-        if value not in [0, 1]:
-            raise ValueError(f"{value} is not a valid attributes")
+        The snapshot is mapped once, then filtered in memory.
 
-        self._rank_attributes[match.group(1)] = bool(value)
+        Raises:
+            FileNotFoundError: the snapshot has not been created.
 
-    def _getNamedBuilds(self) -> list[NamedBuild]:
-        # get all results
-        results = self._queryEntities(EntityId.BUILD)
+        Returns:
+            BuildsMatrix
+        """
+        if self._snapshot_builds is None:
+            if not os.path.isdir(SNAPSHOT_PATH):
+                raise FileNotFoundError(
+                    f"{SNAPSHOT_PATH} not found, run create_builds.py to create it"
+                )
+            self._snapshot_builds = BuildsMatrix.load(SNAPSHOT_PATH)
 
-        for x, r in enumerate(results):
-            names = {}
-            # get names for each part
-            for e in EntityId:
-                # skip the build Entities as they are not named
-                if e == EntityId.BUILD:
-                    continue
+        if not self._plan.sql_filter:
+            return self._snapshot_builds
 
-                # save all the names for the part
-                names[e.value] = [x for x in self.getNames(e, r.get(f"{e.value}_id"))]
+        return self._filterMatrix(self._snapshot_builds, self._plan.sql_filter)
 
-            # save the names in the results
-            results[x].update(names)
+    def _getNamedBuild(self, builds: BuildsMatrix, x: int) -> NamedBuild:
+        """Create the named build relative to a row of the matrix.
 
-            # delete the ids from the results
-            for i in ID_ATTRIBUTES:
-                del results[x][i]
+        Args:
+            builds (BuildsMatrix)
+            x (int): index of the row.
 
-        # create the named builds
-        return [
-            b
-            for b in [NamedBuild(**row, _weights=self._weights) for row in results]
-            if all(f(b) for f in self._data_filter)  # apply data filters
-        ]
+        Returns:
+            NamedBuild
+        """
+        row = builds.row(x)
+
+        # replace the ids of the parts with their names
+        for e in EntityId:
+            # skip the build Entities as they are not named
+            if e == EntityId.BUILD:
+                continue
+
+            # the lists of names are shared by all the builds with the same part
+            row[e.value] = self.names_index[e].get(row.pop(f"{e.value}_id"), [])
+
+        return NamedBuild(
+            **row,
+            _weights=self._plan.weights,
+            _score=builds.column("score")[x].item(),
+            _score_dev=builds.column("score_dev")[x].item(),
+            **self._algorithms.extra_attributes.get(x, {}),
+        )
 
     def __setattr__(self, __name: str, __value) -> None:
         """Set an attribute of the object.
 
+        The names listed by available_filters, available_sorts_orders, \
+            available_weights and available_ranking_attributes, as well as \
+            limit, seed and sort (None to reset it), change the query.
+
         Args:
             __name (str): name of the attribute.
             __value (_type_): value of the attribute.
         """
-        # try to match the attribute name to a filter
-        if f := match(r"(min|max)_([a-z_]+)", __name):
-            self._setFilter(f, __value)
-            return
-
-        # try to match the attribute name to a sort
-        if f := match(r"sort_([a-z_]+)", __name):
-            self._setSort(f, __value)
-            return
-
-        # try to match the attribute name to a weight
-        if f := match(r"weight_([a-z_]+)", __name):
-            self._setWeight(f, __value)
-            return
-
-        # try to match the attribute name to a rank attribute
-        if f := match(r"rank_([a-z_]+)", __name):
-            self._setRankingAttribute(f, __value)
+        # the prefix of the name tells which part of the query to change
+        prefix, _, attribute = __name.partition("_")
+        if prefix in QUERY_PREFIXES and attribute:
+            self.applyQuery(self._query.withAttribute(__name, __value))
             return
 
-        # set the limit
-        if __name == "limit":
-            if __value is None:
-                self._limit = None
+        match __name:
+            case "limit" | "seed":
+                self.applyQuery(replace(self._query, **{__name: __value}))
+                return
+            case "sort" if __value is None:
+                self.applyQuery(replace(self._query, sort=()))
                 return
-            if not isinstance(__value, int):
-                raise TypeError(f"{__value} is not a valid limit")
-            self._limit = __value
-            return
-
-        # reset the sorting order
-        if __name == "sort" and __value is None:
-            self._sort = []
-            return
-
-        # set the seed
-        if __name == "seed":
-            if not isinstance(__value, int):
-                raise TypeError(f"{__value} is not a valid seed")
-            self._seed = __value
-            return
 
         return super().__setattr__(__name, __value)
 
@@ -400,40 +707,528 @@ class MK8DeluxeBuilds(MK8Deluxe):
         Returns:
             list[str]: List of names relative to the entity.
         """
+        return list(self.names_index[entity_id].get(entity_code, []))
+
+    def _skylineKey(self) -> str:
+        """Return the key identifying a skyline query in the caches.
+
+        Returns:
+            str: ranking attributes and filters of the query.
+        """
+        attributes = [k for k, v in self._plan.rank_attributes.items() if v]
+        query, params = self._buildQuery()
+        key = f"{','.join(attributes)}|{query}|{','.join(str(p) for p in params)}"
+
+        # score filters depend on the weights too
+        if self._plan.data_filter:
+            weights = ",".join(str(self._plan.weights[k]) for k in PARTS_ATTRIBUTES)
+            filters = ",".join(f"{b}_{a}={v}" for a, b, v in self._plan.data_filter)
+            key += f"|{filters}|{weights}"
+
+        return key
+
+    def _skylineTableExists(self) -> bool:
+        """Check if the table of the saved skylines exists.
+
+        A table saved without the fingerprints of the data, by an older \
+            version, can't be trusted, so it is dropped when possible.
+
+        Returns:
+            bool
+        """
+        if not self.tableExists(SKYLINE_CACHE_TABLE):
+            return False
+
+        q = f"SELECT * FROM {SKYLINE_CACHE_TABLE} LIMIT 0"
+        if "fingerprint" in self.getCols(q):
+            return True
+
+        if not self._read_only:
+            self.deleteTable(SKYLINE_CACHE_TABLE)
+            self.commitChanges()
+        return False
+
+    def _loadSkyline(self, key: str) -> list[int] | None:
+        """Load the ids of the builds in a skyline saved in the database.
+
+        Only the skylines saved for the current data are used.
+
+        Args:
+            key (str): key of the skyline query.
+
+        Returns:
+            list[int] | None: None if the skyline has not been saved.
+        """
+        if not self._skylineTableExists():
+            return None
+
         q = (
-            f"SELECT E.NAME "
-            f"FROM {TABLE_NAMES[entity_id]}_names AS E "
-            f"WHERE e.id = {entity_code}"
+            f"SELECT build_id FROM {SKYLINE_CACHE_TABLE} "
+            "WHERE query = ? AND fingerprint = ? ORDER BY build_id"
+        )
+        ids = [r[0] for r in self.query(q, (key, self._currentFingerprint()))]
+        # skylines are never empty, so no rows means a cache miss
+        return ids or None
+
+    def _saveSkyline(self, key: str, ids: list[int]) -> None:
+        """Save the ids of the builds in a skyline in the database, \
+            together with the fingerprint of the data.
+
+        Args:
+            key (str): key of the skyline query.
+            ids (list[int]): ids of the builds in the skyline.
+        """
+        fingerprint = self._currentFingerprint()
+        cols = ["query", "fingerprint", "build_id"]
+        if not self._skylineTableExists():
+            self.createTable(
+                SKYLINE_CACHE_TABLE,
+                cols,
+                ["STRING", "STRING", "INTEGER"],
+                ", ".join(cols),
+            )
+
+        # the skylines computed from other data are never used again
+        q = f"DELETE FROM {SKYLINE_CACHE_TABLE} WHERE fingerprint <> ? OR query = ?"
+        self._cur.execute(q, (fingerprint, key))
+        rows = ([key, fingerprint, i] for i in ids)
+        self.insertMany(SKYLINE_CACHE_TABLE, cols, rows)
+
+    def _runSkyline(self, builds: BuildsMatrix) -> np.ndarray:
+        """Run the skyline algorithm, reusing the skylines already computed.
+
+        Args:
+            builds (BuildsMatrix)
+
+        Returns:
+            np.ndarray: indexes of the builds in the skyline.
+        """
+        key = self._skylineKey()
+        ids = self._skyline_cache.get(key)
+
+        if ids is None and self._persistent_cache:
+            ids = self._loadSkyline(key)
+
+        if ids is None:
+            rows = self._algorithms.runAlgorithm(
+                builds, rank_attributes=self._plan.rank_attributes
+            )
+            ids = builds.ids[rows].tolist()
+
+            if self._persistent_cache and not self._read_only:
+                self._saveSkyline(key, ids)
+        else:
+            self._algorithms.resetExtraAttributes()
+
+        self._skyline_cache.put(key, ids)
+        return np.flatnonzero(np.isin(builds.ids, ids))
+
+    def _returnBuilds(self, builds: BuildsMatrix, rows: np.ndarray) -> np.ndarray:
+        # sort and limit the number of builds
+        if self._plan.limit is not None:
+            return builds.topk(self._plan.sort, self._plan.limit, rows)
+
+        return builds.argsort(self._plan.sort, rows)
+
+    def _canSearch(self) -> bool:
+        """Check if the query can be answered searching the parts.
+
+        Only the best builds by score, filtered by part attributes \
+            or by score, are found this way.
+
+        Returns:
+            bool
+        """
+        return (
+            self._virtual
+            and self._plan.limit is not None
+            and self._algorithms.current_algorithm
+            in [AlgorithmName.TOPK, AlgorithmName.THRESHOLD]
+            and self._plan.sort == [("score", True)]
+            and all(a == "score" for a, _, _ in self._plan.data_filter)
+        )
+
+    def _searchBuilds(self) -> BuildsMatrix:
+        """Find the best builds by score without combining all the parts.
+
+        Returns:
+            BuildsMatrix: sorted builds.
+        """
+        if self._search is None:
+            self._search = BuildSearch(self._partMatrices())
+
+        builds = self._search.search(
+            self._plan.sql_filter + self._plan.data_filter,
+            self._plan.weights,
+            self._plan.limit,
         )
-        return [r[0] for r in self.query(q)]
+        ScoringEngine(builds).apply(self._plan.weights)
+        return builds
+
+    def _scoreExpression(self) -> tuple[str, tuple]:
+        """Build the SQL expression of the score of a build.
+
+        Returns:
+            tuple[str, tuple]: expression of the weighted sum of the stats, \
+                and the weights bound to it.
+        """
+        weights = [(a, float(w)) for a, w in self._plan.weights.items() if w != 0]
+        if not weights:
+            return "0", ()
+
+        # rounded as the scores computed by NumPy, which add the stats in another order
+        expression = " + ".join(f"b.{a} * ?" for a, _ in weights)
+        expression = f"ROUND({expression}, {SCORE_DECIMALS})"
+        return expression, tuple(w for _, w in weights)
+
+    def _canQuery(self) -> bool:
+        """Check if the query can be answered entirely by the database.
+
+        Filters and sorts can involve the part attributes and the score, \
+            whose expression is computed by the database too. \
+            The score deviation is only computed on the loaded builds.
 
-    def _returnBuilds(self, builds: list[NamedBuild]) -> list[NamedBuild]:
-        # sort the builds by score
-        for f in self._sort[::-1]:
-            builds.sort(key=lambda x: x.__getattribute__(f[0]), reverse=f[1])
+        Returns:
+            bool
+        """
+        if self._virtual or self._snapshot or self._plan.limit is None:
+            return False
+
+        sortable = PARTS_ATTRIBUTES + ["score"]
+        match self._algorithms.current_algorithm:
+            case AlgorithmName.TOPK:
+                sorted_in_sql = all(a in sortable for a, _ in self._plan.sort)
+            case AlgorithmName.THRESHOLD:
+                sorted_in_sql = self._plan.sort == [("score", True)]
+            case _:
+                return False
+
+        return sorted_in_sql and all(a == "score" for a, _, _ in self._plan.data_filter)
+
+    def _queryBuilds(self) -> BuildsMatrix:
+        """Filter, sort and limit the builds in the database.
 
-        # limit the number of builds
-        if self._limit is not None:
-            builds = builds[: self._limit]
+        Only the returned builds are loaded.
 
+        Returns:
+            BuildsMatrix: sorted builds.
+        """
+        expression, weights = self._scoreExpression()
+        query = QueryBuilder("builds", "b").compute("score", expression, weights)
+        query.filter(self._plan.sql_filter + self._plan.data_filter)
+        for attribute, descending in self._plan.sort:
+            # without weights the score is a constant, which SQLite would read
+            # as the position of a column, and sorting by it changes nothing
+            if attribute == "score" and not weights:
+                continue
+            query.orderBy(attribute, descending)
+        # ties are broken by id, as in the sort of the loaded builds
+        query.orderBy("id").limit(self._plan.limit)
+
+        q, params = query.build()
+        builds = BuildsMatrix.fromRows(self.query(q, params), self.getCols(q, params))
+        ScoringEngine(builds).apply(self._plan.weights)
         return builds
 
+    def _canStream(self) -> bool:
+        """Check if the query can be answered streaming the builds table.
+
+        Returns:
+            bool
+        """
+        return (
+            self._streaming
+            and not self._virtual
+            and not self._snapshot
+            and self._plan.limit is not None
+            and self._algorithms.current_algorithm == AlgorithmName.TOPK
+        )
+
+    def _streamBuilds(self) -> BuildsMatrix:
+        """Find the best builds reading the builds table in batches.
+
+        Each batch is scored and filtered, then merged with the best builds \
+            found so far, so only a batch and the limit are kept in memory.
+
+        Returns:
+            BuildsMatrix: sorted builds.
+        """
+        query = self._buildQuery()
+        cols = self.getCols(*query)
+        # ties are broken by id, as in the sort of the loaded builds
+        sort = self._plan.sort + [("id", False)]
+
+        best = None
+        for rows in self.stream(*query):
+            batch = BuildsMatrix.fromRows(rows, cols)
+            ScoringEngine(batch).apply(self._plan.weights)
+            batch = self._filterMatrix(batch)
+
+            if best is not None:
+                batch = BuildsMatrix.concatenate([best, batch])
+            best = batch.take(batch.topk(sort, self._plan.limit))
+
+        if best is None:
+            best = BuildsMatrix.fromRows([], cols)
+            ScoringEngine(best).apply(self._plan.weights)
+
+        return best
+
+    def _selectBuilds(self) -> tuple[BuildsMatrix, np.ndarray]:
+        """Select the builds according to the selected algorithm.
+
+        Returns:
+            tuple[BuildsMatrix, np.ndarray]: builds and sorted indexes \
+                of the selected ones.
+        """
+        for can, select in [
+            (self._canSearch, self._searchBuilds),
+            (self._canQuery, self._queryBuilds),
+            (self._canStream, self._streamBuilds),
+        ]:
+            if can():
+                builds = select()
+                self._algorithms.resetExtraAttributes()
+                return builds, np.arange(len(builds))
+
+        builds = self._loadMatrix()
+        self._scoring.apply(self._plan.weights)
+        builds = self._filterMatrix(builds)
+
+        if self._algorithms.current_algorithm == AlgorithmName.SKYLINE:
+            rows = self._runSkyline(builds)
+        else:
+            rows = self._algorithms.runAlgorithm(
+                builds,
+                sort=self._plan.sort,
+                limit=self._plan.limit,
+                weight=self._plan.weights,
+                rank_attributes=self._plan.rank_attributes,
+                seed=self._plan.seed,
+            )
+        return builds, self._returnBuilds(builds, rows)
+
+    def _computeFingerprint(self) -> str:
+        """Compute a fingerprint of the data the builds are read from.
+
+        The part tables are small, so all their rows are hashed. The builds \
+            table is summed by SQLite instead, each stat weighted by its \
+            column and its row, so that it is read without loading it. \
+            Virtual builds are computed from the part tables only, which \
+            may be the only tables of the database.
+
+        Returns:
+            str
+        """
+        digest = sha1()
+        for e in EntityId:
+            if e == EntityId.BUILD:
+                continue
+
+            for table in [TABLE_NAMES[e], f"{TABLE_NAMES[e]}_names"]:
+                for rows in self.stream(f"SELECT * FROM {table} ORDER BY rowid"):
+                    digest.update(repr(rows).encode())
+
+        if self._virtual:
+            return digest.hexdigest()
+
+        cols = self.getCols("SELECT * FROM builds LIMIT 0")
+        weighted = " + ".join(f"{c} * {x}" for x, c in enumerate(cols, start=1))
+        q = f"SELECT count(*), total((rowid + 1) * ({weighted})) FROM builds"
+        digest.update(repr(self.query(q)).encode())
+
+        # the snapshot is written with the builds table, but may be stale
+        if self._snapshot and os.path.isdir(SNAPSHOT_PATH):
+            for name in sorted(os.listdir(SNAPSHOT_PATH)):
+                stat = os.stat(os.path.join(SNAPSHOT_PATH, name))
+                digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+
+        return digest.hexdigest()
+
+    def _checkDatabase(self) -> None:
+        """Drop everything loaded or computed from the data if another \
+            connection changed the database since the last query.
+
+        The fingerprint of the data is computed again when the database \
+            changed, so that the loaded data is kept if the change did not \
+            touch it. If it was never computed, the data is dropped anyway.
+        """
+        version = self.query("PRAGMA data_version")[0][0]
+        if version == self._data_version:
+            return
+
+        if self._data_version is not None:
+            fingerprint = self._computeFingerprint()
+            if fingerprint != self._fingerprint:
+                self._names = None
+                self._scoring = None
+                self._scoring_query = None
+                self._snapshot_builds = None
+                self._search = None
+                self._skyline_cache.clear()
+                if self._results is not None:
+                    self._results.clear()
+
+            self._fingerprint = fingerprint
+
+        self._data_version = version
+
+    def _currentFingerprint(self) -> str:
+        """Get the fingerprint of the data, computed on first use.
+
+        Returns:
+            str
+        """
+        if self._fingerprint is None:
+            self._fingerprint = self._computeFingerprint()
+
+        return self._fingerprint
+
+    def _resultKey(self) -> tuple[BuildQuery, str] | None:
+        """Get the key of the result of the query in the result caches.
+
+        Returns:
+            tuple[BuildQuery, str] | None: normalized query and fingerprint \
+                of the data, None if the result is not cached.
+        """
+        if self._results is None and not self._persistent_cache:
+            return None
+
+        # results without a limit are too large to keep,
+        # k-means results without a seed are random
+        plan = self._plan
+        if plan.limit is None or (
+            plan.algorithm == AlgorithmName.KMEANS and plan.seed is None
+        ):
+            return None
+
+        return self._query.normalized(), self._currentFingerprint()
+
+    def _cachedResult(self, key: tuple[BuildQuery, str]) -> tuple[NamedBuild] | None:
+        """Get a result from the memory, or else from the database.
+
+        Args:
+            key (tuple[BuildQuery, str]): key of the result.
+
+        Returns:
+            tuple[NamedBuild] | None: None if the result is not cached.
+        """
+        if self._results is not None:
+            result = self._results.get(key)
+            if result is not None:
+                return result
+
+        if not self._persistent_cache or not self.tableExists(RESULT_CACHE_TABLE):
+            return None
+
+        q = (
+            f"SELECT result FROM {RESULT_CACHE_TABLE} "
+            "WHERE query = ? AND fingerprint = ?"
+        )
+        rows = self.query(q, (key[0].json, key[1]))
+        if not rows:
+            self._persistent_stats["misses"] += 1
+            return None
+
+        self._persistent_stats["hits"] += 1
+        result = []
+        for attributes in loads(rows[0][0]):
+            score = attributes.pop("score")
+            score_dev = attributes.pop("score_dev")
+            result.append(
+                NamedBuild(
+                    **attributes,
+                    _weights=self._plan.weights,
+                    _score=score,
+                    _score_dev=score_dev,
+                )
+            )
+
+        result = tuple(result)
+        if self._results is not None:
+            self._results.put(key, result)
+        return result
+
+    def _cacheResult(self, key: tuple[BuildQuery, str], result: tuple[NamedBuild]):
+        """Put a result in the memory, and in the database if persistent.
+
+        Args:
+            key (tuple[BuildQuery, str]): key of the result.
+            result (tuple[NamedBuild])
+        """
+        if self._results is not None:
+            self._results.put(key, result)
+
+        if not self._persistent_cache or self._read_only:
+            return
+
+        cols = ["query", "fingerprint", "result"]
+        if not self.tableExists(RESULT_CACHE_TABLE):
+            self.createTable(RESULT_CACHE_TABLE, cols, pk="query, fingerprint")
+
+        # the results computed from other data are never used again
+        q = f"DELETE FROM {RESULT_CACHE_TABLE} WHERE fingerprint <> ? OR query = ?"
+        self._cur.execute(q, (key[1], key[0].json))
+        value = dumps([b.attributes for b in result])
+        self.insertMany(RESULT_CACHE_TABLE, cols, [[key[0].json, key[1], value]])
+
+    def iterBuilds(self) -> Iterator[NamedBuild]:
+        """Sort the builds according to the selected algorithm, lazily.
+
+        The builds are selected when the iteration starts, then each \
+            named build is created only when it is requested.
+
+        Yields:
+            NamedBuild: sorted builds.
+        """
+        self._checkDatabase()
+        key = self._resultKey()
+        if key is not None:
+            result = self._cachedResult(key)
+            if result is not None:
+                self._algorithms.resetExtraAttributes()
+                yield from result
+                return
+
+        builds, rows = self._selectBuilds()
+        if key is None:
+            for x in rows.tolist():
+                yield self._getNamedBuild(builds, x)
+            return
+
+        result = []
+        for x in rows.tolist():
+            result.append(self._getNamedBuild(builds, x))
+            yield result[-1]
+
+        # the result is cached only once all the builds have been created
+        self._cacheResult(key, tuple(result))
+
     def sortBuilds(self) -> list[NamedBuild]:
         """Sort the builds according to the selected algorithm.
 
         Returns:
             list[NamedBuild]: list of sorted builds.
         """
-        builds = self._getNamedBuilds()
-        sorted_builds = self._algorithms.runAlgorithm(
-            builds,
-            sort=self._sort,
-            limit=self._limit,
-            weight=self._weights,
-            rank_attributes=self._rank_attributes,
-            seed=self._seed,
-        )
-        return self._returnBuilds(sorted_builds)
+        return list(self.iterBuilds())
+
+    @property
+    def current_query(self) -> BuildQuery:
+        """Get the parameters of the query.
+
+        Returns:
+            BuildQuery
+        """
+        return self._query
+
+    @property
+    def _plan(self) -> QueryPlan:
+        """Get the plan the query is compiled to.
+
+        Returns:
+            QueryPlan
+        """
+        return self._query.plan
 
     @property
     def algorithm(self) -> str:
@@ -453,7 +1248,63 @@ class MK8DeluxeBuilds(MK8Deluxe):
         Raises:
             ValueError: algorithm is not valid.
         """
-        self._algorithms.setAlgorithm(value)
+        self.applyQuery(replace(self._query, algorithm=value))
+
+    @property
+    def cache_stats(self) -> dict[str, dict[str, int | float]]:
+        """Get the usage statistics of the caches, to size them.
+
+        Returns:
+            dict[str, dict[str, int | float]]: statistics of the results \
+                (empty if not kept in memory) and skylines kept in memory, \
+                and hits and misses of the results saved in the database.
+        """
+        return {
+            "results": {} if self._results is None else self._results.stats,
+            "skylines": self._skyline_cache.stats,
+            "persistent_results": dict(self._persistent_stats),
+        }
+
+    @property
+    def names_index(self) -> dict[EntityId, dict[int, list[str]]]:
+        """Get the names of all the parts, loaded once from the database.
+
+        Returns:
+            dict[EntityId, dict[int, list[str]]]: names of each part, \
+                indexed by entity and part id.
+        """
+        if self._names is None:
+            self._names = self._loadNames()
+
+        return self._names
+
+    @property
+    def skyline_mode(self) -> None:
+        """Strategy used by the skyline algorithm. Write only."""
+        raise AttributeError("skyline_mode can only be set")
+
+    @skyline_mode.setter
+    def skyline_mode(self, value: SkylineMode):
+        """Set the strategy used by the skyline algorithm.
+
+        Args:
+            value (SkylineMode)
+        """
+        self.applyQuery(replace(self._query, skyline_mode=value))
+
+    @property
+    def kmeans_mode(self) -> None:
+        """Strategy used by the k-means algorithm. Write only."""
+        raise AttributeError("kmeans_mode can only be set")
+
+    @kmeans_mode.setter
+    def kmeans_mode(self, value: KMeansMode):
+        """Set the strategy used by the k-means algorithm.
+
+        Args:
+            value (KMeansMode)
+        """
+        self.applyQuery(replace(self._query, kmeans_mode=value))
 
     @property
     def builds(self) -> list[Build]:
@@ -531,4 +1382,4 @@ class MK8DeluxeBuilds(MK8Deluxe):
         Returns:
             dict[str, float]
         """
-        return self._weights
+        return self._plan.weights
@@ -9,10 +9,21 @@ from ujson import dumps
 
 from .constants import DATA_ATTRIBUTES, ID_ATTRIBUTES, PARTS_ATTRIBUTES, EntityId
 
+# names of the parts of a named build
+NAME_ATTRIBUTES = [e.value for e in EntityId if e != EntityId.BUILD]
+
 
 class Entity:
     """Single entity used in the program. It can be a driver, a vehicle, \
-        a tyre or a glider."""
+        a tyre or a glider.
+
+    Attributes are stored in slots instead of a per-instance dict.
+    """
+
+    __slots__ = ("_entity_id", *PARTS_ATTRIBUTES, *ID_ATTRIBUTES)
+
+    # public attributes, in the order they are shown
+    _COLS = PARTS_ATTRIBUTES + ID_ATTRIBUTES
 
     def __init__(self, entity_id: EntityId, **kwargs) -> Entity:
         """Initialize the entity.
@@ -23,10 +34,10 @@ class Entity:
         self._entity_id = entity_id
 
         for v in PARTS_ATTRIBUTES:
-            self.__setattr__(v, kwargs.get(v, 0))
+            setattr(self, v, kwargs.get(v, 0))
 
         for i in ID_ATTRIBUTES:
-            self.__setattr__(i, kwargs.get(i, None))
+            setattr(self, i, kwargs.get(i, None))
 
     def __str__(self) -> str:
         """Return the string representation of the entity.
@@ -34,9 +45,7 @@ class Entity:
         Returns:
             str
         """
-        return ", ".join(
-            str(a) for a in self.__dict__.items() if not a[0].startswith("_")
-        )
+        return ", ".join(str((k, getattr(self, k))) for k in self._COLS)
 
     def __repr__(self) -> str:
         """Return the string representation of the entity.
@@ -94,17 +103,11 @@ class Entity:
         Returns:
             dict[str, int | str]: dict of kwargs for the new build.
         """
-        # get common attributes
-        common = set(self.__dict__.keys()) & set(other.__dict__.keys()) - set(
-            ID_ATTRIBUTES
-        )
-
         kwargs = {}
 
-        # sum the common attributes
-        for k in common:
-            if isinstance(self.__dict__[k], int) or isinstance(other.__dict__[k], int):
-                kwargs[k] = self.__dict__[k] + other.__dict__[k]
+        # sum the stats
+        for k in PARTS_ATTRIBUTES:
+            kwargs[k] = getattr(self, k) + getattr(other, k)
 
         # get the id attributes
         for i in ID_ATTRIBUTES:
@@ -126,9 +129,7 @@ class Entity:
         Returns:
             str: comma separated values.
         """
-        return ",".join(
-            str(v) for k, v in self.__dict__.items() if not k.startswith("_")
-        )
+        return ",".join(str(getattr(self, k)) for k in self._COLS)
 
     @property
     def csv_cols(self) -> str:
@@ -146,7 +147,7 @@ class Entity:
         Returns:
             list[str]
         """
-        return [k for k in self.__dict__.keys() if not k.startswith("_")]
+        return list(self._COLS)
 
     @property
     def rows(self) -> list[str | int]:
@@ -155,13 +156,15 @@ class Entity:
         Returns:
             list[str | int]
         """
-        return [self.__getattribute__(k) for k in self.cols]
+        return [getattr(self, k) for k in self._COLS]
 
 
 class Part(Entity):
     """Single part used in the program. It can be a driver, a vehicle, \
         a tyre or a glider."""
 
+    __slots__ = ()
+
     def __init__(self, entity_id: EntityId, **kwargs) -> Part:
         """Initialize the part."""
         super().__init__(entity_id, **kwargs)
@@ -190,6 +193,8 @@ class PartFactory:
 class Build(Entity):
     """Class for a build."""
 
+    __slots__ = ()
+
     def __init__(self, **kwargs: dict) -> Build:
         """Initialize the build."""
         super().__init__(entity_id=None, **kwargs)
@@ -197,7 +202,27 @@ class Build(Entity):
 
 class NamedBuild:
     """Class for a named build. \
-    Instead of having ids for the parts, it has the corresponding names."""
+    Instead of having ids for the parts, it has the corresponding names.
+
+    The id, stats and names are stored in slots, any other attribute \
+        (such as the size of a cluster) in a separate dict, created only \
+        when needed. The attributes and the hash are computed once, on first use.
+    """
+
+    __slots__ = (
+        "id",
+        *PARTS_ATTRIBUTES,
+        *NAME_ATTRIBUTES,
+        "_weights",
+        "_score",
+        "_score_dev",
+        "_extra",
+        "_attributes",
+        "_hash",
+    )
+
+    # public attributes stored in slots, in the order they are shown
+    _COLS = ["id"] + PARTS_ATTRIBUTES + NAME_ATTRIBUTES
 
     def __init__(self, **kwargs: dict) -> NamedBuild:
         """Initialize the named build.
@@ -208,8 +233,34 @@ class NamedBuild:
         if any(k.endswith("_id") for k in kwargs.keys()):
             raise ValueError("NamedBuild cannot have an id")
 
+        self._extra = None
         for k, v in kwargs.items():
-            self.__setattr__(k, v)
+            if k in self.__slots__:
+                setattr(self, k, v)
+            else:
+                if self._extra is None:
+                    self._extra = {}
+                self._extra[k] = v
+
+    def __getattr__(self, __name: str) -> any:
+        """Get an attribute not stored in the slots.
+
+        Args:
+            __name (str): name of the attribute.
+
+        Raises:
+            AttributeError: the attribute does not exist.
+
+        Returns:
+            any
+        """
+        # private slots not set yet are missing, not extra attributes
+        if not __name.startswith("_") and __name in (self._extra or {}):
+            return self._extra[__name]
+
+        raise AttributeError(
+            f"'{self.__class__.__name__}' object has no attribute '{__name}'"
+        )
 
     def __str__(self) -> str:
         """Return the string representation of the named build."""
@@ -226,6 +277,9 @@ class NamedBuild:
     def __eq__(self, __value: object) -> bool:
         """Dunder method for the equality of two named builds.
 
+        Named builds with an identity are equal if they have the same one, \
+            whatever their score. The others are compared attribute by attribute.
+
         Args:
             __value (object): The other named build.
 
@@ -235,19 +289,26 @@ class NamedBuild:
         if self.__class__ != __value.__class__:
             return False
 
-        for k, v in self.attributes.items():
-            if v != __value.attributes[k]:
-                return False
+        if self.identity is not None or __value.identity is not None:
+            return self.identity == __value.identity
 
-        return True
+        return self._getAttributes() == __value._getAttributes()
 
     def __hash__(self) -> int:
         """Dunder method for the hash of the named build.
 
+        The hash is computed once.
+
         Returns:
             int: The hash of the named build.
         """
-        return hash(str(self))
+        if not hasattr(self, "_hash"):
+            if self.identity is not None:
+                self._hash = hash(self.identity)
+            else:
+                self._hash = hash(str(self))
+
+        return self._hash
 
     def __compare__(
         self, other: NamedBuild, attributes: list[str] = None
@@ -276,10 +337,10 @@ class NamedBuild:
         for k in to_compare:
             if k == "id":
                 continue
-            if self.__dict__[k].__class__ not in [int, float]:
+            if getattr(self, k).__class__ not in [int, float]:
                 continue
 
-            diff = self.__dict__[k] - other.__dict__[k]
+            diff = getattr(self, k) - getattr(other, k)
 
             if diff > 0:
                 higher += 1
@@ -336,10 +397,10 @@ class NamedBuild:
         for k in to_compare:
             if k == "id":
                 continue
-            if self.__dict__[k].__class__ not in [int, float]:
+            if getattr(self, k).__class__ not in [int, float]:
                 continue
 
-            distance += (self.__dict__[k] - other.__dict__[k]) ** 2
+            distance += (getattr(self, k) - getattr(other, k)) ** 2
 
         return sqrt(distance)
 
@@ -353,7 +414,7 @@ class NamedBuild:
         Returns:
             list[str]: The keys of the named build.
         """
-        keys = list(self.attributes.keys())
+        keys = list(self._getAttributes().keys())
         if keep_data_attributes:
             return keys
 
@@ -375,14 +436,11 @@ class NamedBuild:
         Returns:
             list[float | int | list[str]]: The values of the named build.
         """
+        attributes = self._getAttributes()
         if keep_data_attributes:
-            return list(self.attributes.values())
-
-        values = []
-        for key in self._getKeys(keep_data_attributes=False):
-            values.append(self.attributes[key])
+            return list(attributes.values())
 
-        return values
+        return [attributes[k] for k in self._getKeys(keep_data_attributes=False)]
 
     def _hasDataAttributes(self) -> bool:
         """Check if the data attributes are present in the named build.
@@ -390,9 +448,8 @@ class NamedBuild:
         Returns:
             bool: True if the data attributes are present, False otherwise.
         """
-        total_attributes_sum = sum(
-            self.attributes[attribute] for attribute in DATA_ATTRIBUTES
-        )
+        attributes = self._getAttributes()
+        total_attributes_sum = sum(attributes[a] for a in DATA_ATTRIBUTES)
         return total_attributes_sum != 0
 
     def csvHeader(self) -> str:
@@ -456,6 +513,30 @@ class NamedBuild:
 
         return dumps(to_dump, indent=indent, sort_keys=sort_keys)
 
+    def _getAttributes(self) -> dict[str, float | int | list[str]]:
+        """Return the attributes of the named build, computed once.
+
+        The dict is shared, so it must not be modified.
+
+        Returns:
+            dict[str, float | int | list[str]]: Attributes.
+        """
+        if not hasattr(self, "_attributes"):
+            attrs = {}
+            attrs["score"] = self.score
+            attrs["score_dev"] = self.score_dev
+            for k in self._COLS:
+                if hasattr(self, k):
+                    attrs[k] = getattr(self, k)
+            for k, v in (self._extra or {}).items():
+                if k in DATA_ATTRIBUTES or k.startswith("_"):
+                    continue
+
+                attrs[k] = v
+            self._attributes = attrs
+
+        return self._attributes
+
     @property
     def attributes(self) -> dict[str, float | int | list[str]]:
         """Return the attributes of the named build.
@@ -463,17 +544,16 @@ class NamedBuild:
         Returns:
             dict[str, float | int | list[str]]: Attributes.
         """
-        attrs = {}
-        attrs["score"] = self.score
-        attrs["score_dev"] = self.score_dev
-        for k, v in self.__dict__.items():
-            if k == "score" or k == "score_dev":
-                continue
-            if k.startswith("_"):
-                continue
+        return dict(self._getAttributes())
+
+    @property
+    def identity(self) -> int | None:
+        """Return what identifies the named build.
 
-            attrs[k] = v
-        return attrs
+        Returns:
+            int | None: id of the build, None if not available.
+        """
+        return getattr(self, "id", None)
 
     @property
     def json(self) -> str:
@@ -530,8 +610,12 @@ class NamedBuild:
         if sum(self._weights.values()) == 0:
             return 0
 
-        items = set(self.__dict__.keys()) & set(PARTS_ATTRIBUTES)
-        return sum(self._weights[v] * self.__getattribute__(v) for v in list(items))
+        # use the score computed by the scoring engine, if available
+        if hasattr(self, "_score"):
+            return self._score
+
+        items = [v for v in PARTS_ATTRIBUTES if hasattr(self, v)]
+        return sum(self._weights[v] * getattr(self, v) for v in items)
 
     @property
     def score_dev(self) -> float:
@@ -545,10 +629,17 @@ class NamedBuild:
         if sum(self._weights.values()) == 0:
             return 0
 
-        return stdev(
-            [
-                self.__dict__[k] * self._weights[k]
-                for k in PARTS_ATTRIBUTES
-                if self._weights[k] != 0
-            ]
-        )
+        # use the score deviation computed by the scoring engine, if available
+        if hasattr(self, "_score_dev"):
+            return self._score_dev
+
+        weighted = [
+            getattr(self, k) * self._weights[k]
+            for k in PARTS_ATTRIBUTES
+            if self._weights[k] != 0
+        ]
+        # the deviation is not defined for less than two values
+        if len(weighted) < 2:
+            return 0
+
+        return stdev(weighted)
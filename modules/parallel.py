@@ -0,0 +1,196 @@
+"""This module contains the parallel execution of the ranking algorithms."""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .builds_matrix import BuildsMatrix
+from .skyline import Skyline
+
+
+def _attach(block: tuple[str, tuple, str]) -> tuple[SharedMemory, np.ndarray]:
+    """Attach to an array in shared memory.
+
+    Args:
+        block (tuple[str, tuple, str]): name, shape and dtype of the array.
+
+    Returns:
+        tuple[SharedMemory, np.ndarray]: the shared memory, which must be \
+            closed when done, and the array backed by it.
+    """
+    name, shape, dtype = block
+    memory = SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+def _partialTopk(block: tuple[str, tuple, str], rows: np.ndarray, k: int) -> np.ndarray:
+    """Select the best k rows of a partition.
+
+    Args:
+        block (tuple[str, tuple, str]): shared array of the sort keys, \
+            shape (n, keys), ascending, the first key being the primary one.
+        rows (np.ndarray): sorted rows of the partition.
+        k (int): number of rows to select.
+
+    Returns:
+        np.ndarray: selected rows, sorted.
+    """
+    memory, keys = _attach(block)
+    try:
+        if k < rows.shape[0]:
+            # only the rows as good as the k-th one can be selected
+            values = keys[rows, 0]
+            rows = rows[values <= np.partition(values, k - 1)[k - 1]]
+
+        # lexsort uses the last key as the primary one, and is stable
+        return rows[np.lexsort(keys[rows].T[::-1])][:k]
+    finally:
+        # the array must be released before the memory is closed
+        del keys
+        memory.close()
+
+
+def _partialSkyline(
+    block: tuple[str, tuple, str], rows: np.ndarray, engine: Skyline
+) -> np.ndarray:
+    """Compute the skyline of a partition.
+
+    Args:
+        block (tuple[str, tuple, str]): shared array of the points, \
+            shape (n, d).
+        rows (np.ndarray): rows of the partition.
+        engine (Skyline)
+
+    Returns:
+        np.ndarray: rows of the partition in its skyline.
+    """
+    memory, points = _attach(block)
+    try:
+        return rows[engine.compute(points[rows])]
+    finally:
+        del points
+        memory.close()
+
+
+class ParallelRunner:
+    """Run the ranking algorithms that can be split on a pool of processes.
+
+    The builds are partitioned by driver and the arrays each partition \
+        needs are shared with the processes instead of being copied. \
+        The partial results are then merged: the best builds of each \
+        partition are sorted together, and the skyline is computed \
+        again on the union of the partial skylines, since a build \
+        dominated in its partition cannot be in the whole skyline.
+    """
+
+    def __init__(self, workers: int) -> ParallelRunner:
+        """Create a parallel runner.
+
+        Args:
+            workers (int): number of processes.
+        """
+        self._workers = workers
+        # processes are started on first use and then reused
+        self._pool = None
+
+    def topk(
+        self, builds: BuildsMatrix, sort: list[tuple[str, bool]], k: int
+    ) -> np.ndarray:
+        """Select the first k builds sorted by multiple keys.
+
+        Args:
+            builds (BuildsMatrix)
+            sort (list[tuple[str, bool]]): list of (column, descending) tuples.
+            k (int): number of builds to select.
+
+        Returns:
+            np.ndarray: sorted indexes of the selected builds, \
+                the same returned by BuildsMatrix.topk.
+        """
+        if not sort:
+            return builds.topk(sort, k)
+
+        keys = np.column_stack(
+            [-builds.column(c) if d else builds.column(c) for c, d in sort]
+        ).astype(np.float64)
+        candidates = self._run(builds, keys, _partialTopk, k)
+
+        return builds.topk(sort, k, np.sort(candidates))
+
+    def skyline(
+        self, builds: BuildsMatrix, attributes: list[str], engine: Skyline
+    ) -> np.ndarray:
+        """Compute the skyline of the builds.
+
+        Args:
+            builds (BuildsMatrix)
+            attributes (list[str]): attributes of the skyline.
+            engine (Skyline)
+
+        Returns:
+            np.ndarray: boolean mask, True for the builds in the skyline.
+        """
+        points = builds.columns(attributes)
+        candidates = np.sort(self._run(builds, points, _partialSkyline, engine))
+
+        skyline = np.zeros(len(builds), dtype=bool)
+        skyline[candidates[engine.compute(points[candidates])]] = True
+        return skyline
+
+    def _partitions(self, builds: BuildsMatrix) -> list[np.ndarray]:
+        """Split the builds by driver, with the same number of drivers each.
+
+        Args:
+            builds (BuildsMatrix)
+
+        Returns:
+            list[np.ndarray]: sorted rows of each non empty partition.
+        """
+        drivers = builds.parts[:, 0]
+        unique, inverse = np.unique(drivers, return_inverse=True)
+        partition = inverse.reshape(-1) % min(self._workers, max(unique.shape[0], 1))
+
+        return [
+            np.flatnonzero(partition == p)
+            for p in range(self._workers)
+            if np.any(partition == p)
+        ]
+
+    def _run(
+        self, builds: BuildsMatrix, array: np.ndarray, task: callable, *args
+    ) -> np.ndarray:
+        """Run a task on each partition, sharing an array with the processes.
+
+        Args:
+            builds (BuildsMatrix)
+            array (np.ndarray): array shared with the processes.
+            task (callable): function of the shared array, the rows \
+                of a partition and args, returning some of the rows.
+
+        Returns:
+            np.ndarray: rows returned by all the tasks.
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._workers)
+
+        array = np.ascontiguousarray(array)
+        memory = SharedMemory(create=True, size=max(array.nbytes, 1))
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)
+        try:
+            shared[...] = array
+            block = (memory.name, array.shape, array.dtype.str)
+
+            futures = [
+                self._pool.submit(task, block, rows, *args)
+                for rows in self._partitions(builds)
+            ]
+            results = [f.result() for f in futures]
+        finally:
+            del shared
+            memory.close()
+            memory.unlink()
+
+        return np.concatenate(results + [np.empty(0, dtype=np.int64)])
@@ -0,0 +1,171 @@
+"""This module contains the builder of the parameterized SQL queries."""
+
+from __future__ import annotations
+
+# comparison operator of each kind of filter
+FILTER_OPERATORS = {"min": ">=", "max": "<="}
+
+
+class QueryBuilder:
+    """Build a parameterized SELECT query.
+
+    Values are never written in the SQL text, but bound to its placeholders, \
+        so queries with the same shape share the same text and SQLite can \
+        reuse the statement it already prepared for it.
+    """
+
+    def __init__(
+        self, table: str, alias: str = None, columns: list[str] = None
+    ) -> QueryBuilder:
+        """Create a query selecting some columns of a table.
+
+        Args:
+            table (str): name of the table.
+            alias (str, optional): alias of the table. Defaults to None.
+            columns (list[str], optional): columns to select. \
+                Defaults to None (all the columns).
+        """
+        self._table = table
+        self._alias = alias
+        self._columns = columns
+        # computed columns, with the values bound to their expressions
+        self._expressions = {}
+        self._conditions = []
+        self._params = []
+        self._order = []
+        self._order_params = []
+        self._limit = None
+
+    def compute(self, name: str, expression: str, params: tuple = ()) -> QueryBuilder:
+        """Define a column computed from the other ones.
+
+        The column can then be used in the conditions and in the sort \
+            like any other column.
+
+        Args:
+            name (str): name of the computed column.
+            expression (str): SQL expression of the column, \
+                with a placeholder for each value.
+            params (tuple, optional): values bound to the expression. \
+                Defaults to ().
+
+        Returns:
+            QueryBuilder: the builder itself.
+        """
+        self._expressions[name] = (expression, tuple(params))
+        return self
+
+    def where(
+        self, column: str, operator: str, value: int | float | str
+    ) -> QueryBuilder:
+        """Add a condition on a column, joined to the others with AND.
+
+        Args:
+            column (str): name of the column.
+            operator (str): comparison operator, such as ">=" or "=".
+            value (int | float | str): value bound to the condition.
+
+        Returns:
+            QueryBuilder: the builder itself.
+        """
+        column, params = self._column(column)
+        self._conditions.append(f"{column} {operator} ?")
+        self._params.extend(params + (value,))
+        return self
+
+    def filter(self, filters: list[tuple[str, str, int | float]]) -> QueryBuilder:
+        """Add a condition for each min or max filter.
+
+        Args:
+            filters (list[tuple[str, str, int | float]]): list of \
+                (column, "min" or "max", value) filters.
+
+        Returns:
+            QueryBuilder: the builder itself.
+        """
+        for column, bound, value in filters:
+            self.where(column, FILTER_OPERATORS[bound], value)
+
+        return self
+
+    def orderBy(self, column: str, descending: bool = False) -> QueryBuilder:
+        """Add a sort key, after the ones already added.
+
+        Args:
+            column (str): name of the column.
+            descending (bool, optional): Defaults to False.
+
+        Returns:
+            QueryBuilder: the builder itself.
+        """
+        column, params = self._column(column)
+        self._order.append(f"{column} {'DESC' if descending else 'ASC'}")
+        self._order_params.extend(params)
+        return self
+
+    def limit(self, limit: int) -> QueryBuilder:
+        """Limit the number of rows returned.
+
+        Args:
+            limit (int)
+
+        Returns:
+            QueryBuilder: the builder itself.
+        """
+        self._limit = limit
+        return self
+
+    def build(self) -> tuple[str, tuple]:
+        """Build the query.
+
+        Returns:
+            tuple[str, tuple]: text of the query and values of its placeholders.
+        """
+        columns = "*"
+        if self._columns is not None:
+            columns = ", ".join(self._qualify(c) for c in self._columns)
+
+        q = f"SELECT {columns} FROM {self._table}"
+        if self._alias is not None:
+            q += f" AS {self._alias}"
+
+        params = list(self._params)
+        if self._conditions:
+            q += f" WHERE {' AND '.join(self._conditions)}"
+        if self._order:
+            q += f" ORDER BY {', '.join(self._order)}"
+            params.extend(self._order_params)
+        if self._limit is not None:
+            q += " LIMIT ?"
+            params.append(self._limit)
+
+        return q, tuple(params)
+
+    def _column(self, column: str) -> tuple[str, tuple]:
+        """Return the SQL of a column used in a condition or in the sort.
+
+        Args:
+            column (str): name of the column, either computed or of the table.
+
+        Returns:
+            tuple[str, tuple]: SQL of the column and the values bound to it.
+        """
+        if column in self._expressions:
+            expression, params = self._expressions[column]
+            return f"({expression})", params
+
+        return self._qualify(column), ()
+
+    def _qualify(self, column: str) -> str:
+        """Qualify a column with the alias of the table.
+
+        Args:
+            column (str): name of the column.
+
+        Returns:
+            str
+        """
+        if self._alias is None:
+            return column
+
+        return f"{self._alias}.{column}"
@@ -0,0 +1,85 @@
+"""This module contains the engine used to score the builds."""
+
+from __future__ import annotations
+
+import numpy as np
+
+from .builds_matrix import BuildsMatrix
+from .cache import LRUCache
+from .constants import PARTS_ATTRIBUTES, SCORE_DECIMALS
+
+
+class ScoringEngine:
+    """Compute the score and the score deviation of all the builds at once.
+
+    Results are cached for each weight vector, so that the same weights \
+        are never evaluated twice on the same builds.
+    """
+
+    def __init__(self, builds: BuildsMatrix, cache_size: int = 32) -> ScoringEngine:
+        """Create a scoring engine.
+
+        Args:
+            builds (BuildsMatrix): builds to score.
+            cache_size (int, optional): number of weight vectors to cache. \
+                Defaults to 32.
+        """
+        self._builds = builds
+        self._cache = LRUCache(cache_size)
+
+    def score(self, weights: dict[str, float]) -> tuple[np.ndarray, np.ndarray]:
+        """Score all the builds.
+
+        Args:
+            weights (dict[str, float]): weight of each part attribute.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: score and score deviation of each build.
+        """
+        key = tuple(float(weights[k]) for k in PARTS_ATTRIBUTES)
+        if key not in self._cache:
+            self._cache.put(key, self._score(np.array(key)))
+
+        return self._cache.get(key)
+
+    def _score(self, weights: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Score all the builds with a weight vector.
+
+        Args:
+            weights (np.ndarray): weight of each part attribute.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: score and score deviation of each build.
+        """
+        n = len(self._builds)
+        if weights.sum() == 0:
+            return np.zeros(n), np.zeros(n)
+
+        score = np.round(self._builds.stats @ weights, SCORE_DECIMALS)
+
+        # the deviation is calculated with respect to the considered parameters
+        considered = weights != 0
+        if np.count_nonzero(considered) < 2:
+            return score, np.zeros(n)
+
+        weighted = self._builds.stats[:, considered] * weights[considered]
+        return score, weighted.std(axis=1, ddof=1)
+
+    def apply(self, weights: dict[str, float]) -> None:
+        """Score all the builds and save the results as columns of the matrix.
+
+        Args:
+            weights (dict[str, float]): weight of each part attribute.
+        """
+        score, score_dev = self.score(weights)
+        self._builds.setColumn("score", score)
+        self._builds.setColumn("score_dev", score_dev)
+
+    @property
+    def builds(self) -> BuildsMatrix:
+        """Return the scored builds.
+
+        Returns:
+            BuildsMatrix
+        """
+        return self._builds
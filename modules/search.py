@@ -0,0 +1,241 @@
+"""This module contains the branch and bound search over the parts."""
+
+from __future__ import annotations
+
+import numpy as np
+
+from .builds_matrix import BuildsMatrix
+from .constants import PARTS_ATTRIBUTES, SCORE_DECIMALS
+
+
+class BuildSearch:
+    """Search the builds combining the parts, without creating all of them.
+
+    Parts are chosen one kind at a time (driver, vehicle, tyre, glider). \
+        Each partial build is discarded as soon as the best and worst stats \
+        the remaining kinds of parts can add prove that no complete build \
+        can match the filters, or beat the builds already found.
+    The last kinds of parts are combined in advance and evaluated at once.
+    """
+
+    def __init__(
+        self, parts: list[tuple[np.ndarray, np.ndarray]], leaf_size: int = 4096
+    ) -> BuildSearch:
+        """Create a search over the parts.
+
+        Args:
+            parts (list[tuple[np.ndarray, np.ndarray]]): ids, of shape (p,), \
+                and stats, of shape (p, len(PARTS_ATTRIBUTES)), of each kind \
+                of part, in the order of ID_ATTRIBUTES.
+            leaf_size (int, optional): maximum number of combinations \
+                of the last kinds of parts evaluated at once. Defaults to 4096.
+        """
+        self._parts = parts
+        self._shape = tuple(ids.shape[0] for ids, _ in parts)
+
+        # combine the last kinds of parts while they fit in a leaf
+        self._depth = len(parts) - 1
+        while self._depth > 0 and np.prod(self._shape[self._depth - 1 :]) <= leaf_size:
+            self._depth -= 1
+
+        self._leaf = BuildsMatrix.fromParts(parts[self._depth :])
+        # position of each leaf combination in the lists of its parts
+        self._leaf_positions = np.stack(
+            np.unravel_index(np.arange(len(self._leaf)), self._shape[self._depth :]),
+            axis=1,
+        )
+
+        # best and worst stats the kinds of parts from each depth can add
+        self._max_left = self._suffix(
+            [s.max(axis=0) for _, s in parts], self._leaf.stats.max(axis=0)
+        )
+        self._min_left = self._suffix(
+            [s.min(axis=0) for _, s in parts], self._leaf.stats.min(axis=0)
+        )
+
+    def _suffix(
+        self, values: list[np.ndarray | float], leaf: np.ndarray | float
+    ) -> list[np.ndarray | float]:
+        """Sum the values of the kinds of parts from each depth to the leaf.
+
+        Args:
+            values (list[np.ndarray | float]): a value for each kind of part.
+            leaf (np.ndarray | float): value of the leaf.
+
+        Returns:
+            list[np.ndarray | float]: sum of the values from each depth.
+        """
+        sums = [leaf] * (self._depth + 1)
+        for x in range(self._depth - 1, -1, -1):
+            sums[x] = sums[x + 1] + values[x]
+
+        return sums
+
+    def search(
+        self,
+        filters: list[tuple[str, str, float]] = None,
+        weights: dict[str, float] = None,
+        k: int = None,
+    ) -> BuildsMatrix:
+        """Find the builds matching the filters with the highest score.
+
+        Args:
+            filters (list[tuple[str, str, float]], optional): list of \
+                (attribute, "min" or "max", value) filters. The attribute \
+                is either a part attribute or the score. Defaults to None.
+            weights (dict[str, float], optional): weight of each part attribute. \
+                Defaults to None (all weights are 0).
+            k (int, optional): number of builds to return. \
+                Defaults to None (all the builds matching the filters).
+
+        Returns:
+            BuildsMatrix: builds found, sorted by descending score and then by id, \
+                with their score as a column.
+        """
+        filters = filters or []
+        w = np.array([(weights or {}).get(a, 0) for a in PARTS_ATTRIBUTES], dtype=float)
+
+        self._min_bounds = np.full(len(PARTS_ATTRIBUTES), -np.inf)
+        self._max_bounds = np.full(len(PARTS_ATTRIBUTES), np.inf)
+        self._min_score, self._max_score = -np.inf, np.inf
+        for attribute, bound, value in filters:
+            if attribute == "score":
+                if bound == "min":
+                    self._min_score = max(self._min_score, value)
+                else:
+                    self._max_score = min(self._max_score, value)
+                continue
+
+            a = PARTS_ATTRIBUTES.index(attribute)
+            if bound == "min":
+                self._min_bounds[a] = max(self._min_bounds[a], value)
+            else:
+                self._max_bounds[a] = min(self._max_bounds[a], value)
+
+        self._weights = w
+        self._k = k
+        # best score the kinds of parts from each depth can add
+        self._leaf_scores = self._leaf.stats @ w
+        self._score_left = self._suffix(
+            [(s @ w).max() for _, s in self._parts], self._leaf_scores.max()
+        )
+
+        self._found = []
+        self._found_scores = np.empty(0)
+        self._found_ids = np.empty(0, dtype=np.int64)
+
+        self._visit(0, np.zeros(len(PARTS_ATTRIBUTES), dtype=np.int64), [])
+
+        return self._result()
+
+    def _feasible(self, depth: int, stats: np.ndarray) -> bool:
+        """Check if a partial build can still lead to a build worth returning.
+
+        Args:
+            depth (int): number of kinds of parts already chosen.
+            stats (np.ndarray): stats of the partial build.
+
+        Returns:
+            bool
+        """
+        if np.any(stats + self._max_left[depth] < self._min_bounds):
+            return False
+        if np.any(stats + self._min_left[depth] > self._max_bounds):
+            return False
+
+        best = np.round(stats @ self._weights + self._score_left[depth], SCORE_DECIMALS)
+        if best < self._min_score:
+            return False
+
+        # a build with the same score as the k-th one would still be worse, \
+        #   as the builds are visited in ascending order of id
+        return not (
+            self._k is not None
+            and self._found_scores.shape[0] >= self._k
+            and best <= self._found_scores[self._k - 1]
+        )
+
+    def _visit(self, depth: int, stats: np.ndarray, positions: list[int]) -> None:
+        """Visit the partial builds obtained adding a part of the next kind.
+
+        Args:
+            depth (int): number of kinds of parts already chosen.
+            stats (np.ndarray): stats of the partial build.
+            positions (list[int]): position of each chosen part in its list.
+        """
+        if not self._feasible(depth, stats):
+            return
+
+        if depth == self._depth:
+            self._evaluate(stats, positions)
+            return
+
+        for x, part_stats in enumerate(self._parts[depth][1]):
+            self._visit(depth + 1, stats + part_stats, positions + [x])
+
+    def _evaluate(self, stats: np.ndarray, positions: list[int]) -> None:
+        """Evaluate all the builds completing a partial build with a leaf.
+
+        Args:
+            stats (np.ndarray): stats of the partial build.
+            positions (list[int]): position of each chosen part in its list.
+        """
+        builds = stats + self._leaf.stats
+        scores = np.round(stats @ self._weights + self._leaf_scores, SCORE_DECIMALS)
+
+        mask = np.all(builds >= self._min_bounds, axis=1)
+        mask &= np.all(builds <= self._max_bounds, axis=1)
+        mask &= (scores >= self._min_score) & (scores <= self._max_score)
+        if self._k is not None and self._found_scores.shape[0] >= self._k:
+            mask &= scores > self._found_scores[self._k - 1]
+
+        rows = np.flatnonzero(mask)
+        if rows.shape[0] == 0:
+            return
+
+        all_positions = np.hstack(
+            [np.tile(positions, (rows.shape[0], 1)), self._leaf_positions[rows]]
+        ).astype(np.int64)
+        ids = np.ravel_multi_index(tuple(all_positions.T), self._shape)
+
+        self._found.append((ids, builds[rows], all_positions))
+        scores = np.concatenate([self._found_scores, scores[rows]])
+        ids = np.concatenate([self._found_ids, ids])
+
+        # keep only the best k builds, sorted, to bound the next ones
+        if self._k is not None:
+            order = np.lexsort((ids, -scores))[: self._k]
+            scores, ids = scores[order], ids[order]
+        self._found_scores, self._found_ids = scores, ids
+
+    def _result(self) -> BuildsMatrix:
+        """Collect the builds found.
+
+        Returns:
+            BuildsMatrix
+        """
+        width = len(self._parts)
+        ids = np.concatenate([f[0] for f in self._found] + [np.empty(0, np.int64)])
+        stats = np.vstack(
+            [f[1] for f in self._found]
+            + [np.empty((0, len(PARTS_ATTRIBUTES)), np.int64)]
+        )
+        positions = np.vstack(
+            [f[2] for f in self._found] + [np.empty((0, width), np.int64)]
+        )
+
+        if self._k is None:
+            order = np.lexsort((self._found_ids, -self._found_scores))
+            self._found_scores = self._found_scores[order]
+            self._found_ids = self._found_ids[order]
+
+        # select the builds that survived, in their final order
+        where = {i: x for x, i in enumerate(ids.tolist())}
+        rows = np.array([where[i] for i in self._found_ids.tolist()], dtype=np.int64)
+
+        parts = np.stack(
+            [self._parts[y][0][positions[rows, y]] for y in range(width)], axis=1
+        ).reshape(-1, width)
+        builds = BuildsMatrix(ids[rows], stats[rows], parts)
+        builds.setColumn("score", self._found_scores)
+        return builds
@@ -0,0 +1,159 @@
+"""This module contains the engine used to compute the skyline of the builds."""
+
+from __future__ import annotations
+
+from enum import Enum
+
+import numpy as np
+
+
+class SkylineMode(Enum):
+    """Strategies available to compute the skyline."""
+
+    SORT_FILTER = "sfs"
+    BITSET = "bitset"
+
+
+class Skyline:
+    """Compute the skyline (Pareto set) of a set of points.
+
+    A point belongs to the skyline if no other point is greater or equal \
+        in every dimension and strictly greater in at least one.
+    Identical points do not dominate each other, so they are all part \
+        of the skyline or none of them is.
+    """
+
+    def __init__(
+        self, mode: SkylineMode = SkylineMode.BITSET, block_size: int = 1024
+    ) -> Skyline:
+        """Create a skyline engine.
+
+        Args:
+            mode (SkylineMode, optional): strategy used to compute the skyline. \
+                Defaults to SkylineMode.BITSET.
+            block_size (int, optional): number of points tested at once. \
+                Defaults to 1024.
+        """
+        self._modes = {
+            SkylineMode.SORT_FILTER.value: self._sortFilter,
+            SkylineMode.BITSET.value: self._bitset,
+        }
+        self._mode = mode
+        self._block_size = block_size
+
+    def setMode(self, mode: SkylineMode) -> None:
+        """Set the strategy used to compute the skyline.
+
+        Args:
+            mode (SkylineMode)
+        """
+        self._mode = mode
+
+    def compute(self, points: np.ndarray) -> np.ndarray:
+        """Compute the skyline of the points.
+
+        Args:
+            points (np.ndarray): points of shape (n, d).
+
+        Raises:
+            ValueError: no dimension is provided.
+
+        Returns:
+            np.ndarray: boolean mask of shape (n,), True for the skyline points.
+        """
+        if points.shape[1] == 0:
+            raise ValueError(
+                "At least one attribute must be provided for the skyline query"
+            )
+
+        if points.shape[0] == 0:
+            return np.zeros(0, dtype=bool)
+
+        # identical points share the same outcome, so they are tested once
+        unique, inverse = np.unique(points, axis=0, return_inverse=True)
+        skyline = self._modes[self._mode.value](unique)
+        return skyline[inverse.reshape(-1)]
+
+    def _sortFilter(self, points: np.ndarray) -> np.ndarray:
+        """Compute the skyline of distinct points with the sort-filter-skyline.
+
+        Points are presorted by the sum of their coordinates, so that no point \
+            can be dominated by a point that comes later. A point is then part \
+            of the skyline if no point of the window dominates it, \
+            and the window never needs to be pruned.
+
+        Args:
+            points (np.ndarray): distinct points of shape (n, d).
+
+        Returns:
+            np.ndarray: boolean mask of shape (n,), True for the skyline points.
+        """
+        order = np.argsort(-points.sum(axis=1), kind="stable")
+        window = np.empty((0, points.shape[1]), dtype=points.dtype)
+        skyline = np.zeros(points.shape[0], dtype=bool)
+
+        for start in range(0, order.shape[0], self._block_size):
+            rows = order[start : start + self._block_size]
+            block = points[rows]
+
+            # since the points are distinct, being greater or equal \
+            #   in every dimension is enough to dominate
+            keep = np.ones(rows.shape[0], dtype=bool)
+            for w in range(0, window.shape[0], self._block_size):
+                chunk = window[w : w + self._block_size]
+                keep &= ~np.any(
+                    np.all(chunk[None, :, :] >= block[:, None, :], axis=2), axis=1
+                )
+
+            # points of the block can still dominate each other
+            rows, block = rows[keep], block[keep]
+            dominated = np.all(block[None, :, :] >= block[:, None, :], axis=2)
+            np.fill_diagonal(dominated, False)
+            rows, block = rows[~dominated.any(axis=1)], block[~dominated.any(axis=1)]
+
+            skyline[rows] = True
+            window = np.concatenate([window, block])
+
+        return skyline
+
+    def _bitset(self, points: np.ndarray) -> np.ndarray:
+        """Compute the skyline of distinct points with bitset dominance tests.
+
+        For each dimension and each value, the set of points greater or equal \
+            to that value is stored as a bitset. The points dominating a point \
+            are the intersection of its bitsets over all dimensions, \
+            so a point is in the skyline if only itself is left.
+
+        Args:
+            points (np.ndarray): distinct points of shape (n, d).
+
+        Returns:
+            np.ndarray: boolean mask of shape (n,), True for the skyline points.
+        """
+        n = points.shape[0]
+        words = (n + 63) // 64
+
+        bitsets = []
+        values = []
+        for d in range(points.shape[1]):
+            levels, inverse = np.unique(points[:, d], return_inverse=True)
+            masks = np.zeros((levels.shape[0], words * 64), dtype=bool)
+            masks[:, :n] = points[None, :, d] >= levels[:, None]
+            bitsets.append(np.packbits(masks, axis=1).view(np.uint64))
+            values.append(inverse.reshape(-1))
+
+        skyline = np.zeros(n, dtype=bool)
+        for start in range(0, n, self._block_size):
+            rows = np.arange(start, min(start + self._block_size, n))
+
+            dominating = bitsets[0][values[0][rows]]
+            for d in range(1, len(bitsets)):
+                dominating &= bitsets[d][values[d][rows]]
+
+            # remove each point from its own set of dominating points
+            own = np.right_shift(np.uint8(128), (rows % 8).astype(np.uint8))
+            dominating.view(np.uint8)[np.arange(rows.shape[0]), rows // 8] &= ~own
+
+            skyline[rows] = ~dominating.any(axis=1)
+
+        return skyline
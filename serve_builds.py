@@ -0,0 +1,172 @@
+"""This module contains the server answering the queries of find_builds.py.
+
+The server keeps the same builds database open between queries, so the builds, \
+    the names of the parts and the computed scores and skylines are loaded \
+    once and then reused, instead of being loaded again by every run of the script.
+"""
+
+import argparse
+import sqlite3
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import StringIO
+
+from ujson import dumps, loads
+
+from find_builds import build_parser, run
+from modules.database import MK8DeluxeBuilds
+
+
+class BuildsRequestHandler(BaseHTTPRequestHandler):
+    """Handle the queries sent to the server.
+
+    Each query is a POST request with a JSON body such as \
+        {"args": ["--topk", "--limit", "3"]}, holding the same command line \
+        arguments accepted by find_builds.py. The response is the text \
+        the script would print. A GET request on /stats returns the usage \
+        statistics of the caches as JSON.
+    """
+
+    # builds database shared by all the queries, set by serve()
+    builds: MK8DeluxeBuilds = None
+
+    def do_GET(self) -> None:
+        """Answer with the usage statistics of the caches, on /stats."""
+        if self.path != "/stats":
+            self._reply(404, "Not found\n")
+            return
+
+        self._reply(200, dumps(self.builds.cache_stats) + "\n")
+
+    def do_POST(self) -> None:
+        """Answer a query."""
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            args = loads(self.rfile.read(length))["args"]
+            parameters = build_parser().parse_args(args)
+        except (KeyError, TypeError, ValueError) as e:
+            self._reply(400, f"Invalid query: {e}\n")
+            return
+        except SystemExit:
+            # argparse exits on the arguments it cannot parse
+            self._reply(400, "Invalid arguments, see find_builds.py --help\n")
+            return
+
+        # the query replaces the previous one, the loaded data is kept
+        output = StringIO()
+        try:
+            run(self.builds, parameters, output)
+        except (AttributeError, TypeError, ValueError) as e:
+            self._reply(400, f"Invalid query: {e}\n")
+            return
+        except sqlite3.Error as e:
+            self._reply(500, f"Database error: {e}\n")
+            return
+
+        self._reply(200, output.getvalue())
+
+    def _reply(self, status: int, text: str) -> None:
+        """Send a text response.
+
+        Args:
+            status (int): HTTP status code.
+            text (str): body of the response.
+        """
+        body = text.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(parameters: argparse.Namespace) -> None:
+    """Run the main function for the serve builds script."""
+    BuildsRequestHandler.builds = MK8DeluxeBuilds(
+        persistent_cache=parameters.persistent_cache,
+        virtual=parameters.virtual,
+        streaming=parameters.streaming,
+        workers=parameters.workers,
+        snapshot=parameters.snapshot,
+        result_cache_size=parameters.result_cache,
+    )
+
+    # queries are answered one at a time, in the thread that opened the database
+    server = HTTPServer((parameters.host, parameters.port), BuildsRequestHandler)
+    print(f"Serving builds on http://{parameters.host}:{parameters.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    """Run the main function for the serve builds script."""
+    parser = argparse.ArgumentParser(
+        "Serve builds",
+        description="Answer the queries of find_builds.py, "
+        "keeping the builds loaded between them.",
+    )
+
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Address to listen on.",
+    )
+
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8765,
+        help="Port to listen on.",
+    )
+
+    parser.add_argument(
+        "--virtual",
+        action="store_true",
+        help="Compute the builds from the parts instead of reading the builds table.",
+    )
+
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Read the builds table in batches for the top-k queries, "
+        "keeping only the best builds in memory.",
+    )
+
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="Map the binary snapshot of the builds "
+        "instead of reading the builds table.",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes running the top-k and skyline algorithms.",
+    )
+
+    parser.add_argument(
+        "--persistent-cache",
+        action="store_true",
+        help="Save the computed skylines and the results of the queries "
+        "in the database, to reuse them later.",
+    )
+
+    parser.add_argument(
+        "--result-cache",
+        type=int,
+        default=64,
+        help="Number of results of the queries kept in memory, 0 to keep none.",
+    )
+
+    args = parser.parse_args()
+
+    serve(args)
+
+
+if __name__ == "__main__":
+    main()